@@ -1,16 +1,24 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk, ImageFile, ImageDraw, ImageGrab
+from PIL import Image, ImageTk, ImageFile, ImageGrab
 import math
+import multiprocessing
 import os
-import re
+import queue
 import threading
-import cv2
+from collections import OrderedDict
 import numpy as np
 import locale
-import gettext
 import webbrowser
-import shutil
+from deskew_core import (
+    DEFAULT_BG_COLOR, SUPPORTED_EXTENSIONS, DESKEW_FOLDER_NAME, HOUGH_METHODS,
+    MIN_ROTATION_ANGLE, ANGLE_CACHE_FILENAME, DEFAULT_ROTATION_BACKEND, ENCODER_PRESETS, DEFAULT_ENCODER_PRESET,
+    STRIP_MEMORY_BUDGET, UNCHANGED_OUTPUT_MODES, DeskewDetector, AngleCache,
+    BatchDeskewPipeline, BackgroundSaver, rotate_image, rotate_to_size, expanded_size, crop_to_size,
+    DecodedImageCache, ImagePrefetcher, resolve_image_file, write_unchanged_output, deskewed_filename, save_deskewed_image, save_deskewed_strips, needs_strip_processing,
+    has_alpha_channel, image_nbytes, natural_sort,
+    enable_stage_timings, timing_image
+)
 
 # 常量定义
 DEFAULT_WINDOW_SIZE = "900x900"
@@ -18,10 +26,31 @@ THUMBNAIL_SIZE = 80
 MAX_ZOOM_LEVEL = 10.0
 MIN_ZOOM_LEVEL = 0.1
 ZOOM_FACTOR = 1.2
-DEFAULT_BG_COLOR = (255, 255, 255)
-SUPPORTED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff', '.tif', 
-                        '.webp', '.ico', '.ppm', '.pgm', '.pbm')
 CROSSHAIR_WARNING_THRESHOLD = 10  # 角度阈值，超过10度弹出警告
+PREVIEW_MODES = ('L', 'LA', 'RGB', 'RGBA')  # 交互旋转时使用缩小代理图的图片模式
+ROTATION_FRAME_MS = 16  # 连续旋转按键合并渲染的间隔（约一帧）
+SAVE_POLL_MS = 100  # 主线程检查后台保存结果的间隔
+BATCH_POLL_MS = 100  # 主线程检查批量纠偏进度的间隔
+DEFAULT_UNCHANGED_OUTPUT = "none"  # 未修改的图片不写入Deskew文件夹，直接读取原图（写时复制）
+PREFETCH_PAGES = 2  # 切换图片后在前进方向和反方向各预解码的张数
+PYRAMID_MIN_SIZE = 512  # 显示金字塔最小一级的长边像素数
+DISPLAY_TILE_SIZE = 256  # 显示图块边长（显示像素）
+TILE_CACHE_MAX_BYTES = 96 * 1024 * 1024  # 已渲染图块缓存的内存上限
+CHECKERBOARD_CELL_SIZE = 20  # 透明图片背景棋盘格的格子边长
+CHECKERBOARD_DARK = (0x66, 0x66, 0x66)
+CHECKERBOARD_LIGHT = (0xB8, 0xB8, 0xB8)
+
+
+def preview_source_for(image, screen_size):
+    """大于屏幕两倍以上的图片按整数倍缩小为交互旋转用的代理图，返回 (代理图, 缩小倍数)
+    
+    不涉及 Tk，可在预解码线程中运行；不需要代理图时返回 (None, 1)。
+    """
+    factor = max(image.size) // screen_size
+    if factor >= 2 and image.mode in PREVIEW_MODES:
+        return image.reduce(factor), factor
+    return None, 1
+
 
 # 尝试导入 tkinterdnd2
 try:
@@ -69,13 +98,20 @@ class Internationalization:
                 'select_folder_or_drag': "请选择文件夹或打开图片",
                 'select_folder_only': "请选择文件夹（拖拽功能需要安装tkinterdnd2）",
                 'auto_deskewing': "正在自动纠偏当前图片...",
-                'auto_deskew_complete': "自动纠偏完成，旋转角度: {:.2f}°",
+                'auto_deskew_complete': "自动纠偏完成，旋转角度: {:.2f}°（置信度 {:.0%}）",
                 'no_rotation_needed': "自动纠偏完成，无需旋转",
+                'no_lines_detected': "未检测到文本行，未旋转",
+                'rotation_engine': "旋转引擎: {} / {}",
+                'encoder_preset': "输出编码: {}",
+                'unchanged_output': "未修改图片写入Deskew文件夹: {}",
                 'batch_deskewing': "正在批量纠偏...",
                 'batch_complete': "批量纠偏完成，共处理 {} 张图片",
                 'batch_stopped': "批量纠偏已停止，已处理 {}/{} 张图片",
                 'current_image': "当前图片: {}",
                 'modified': " [已修改]",
+                'save_pending': " [保存中]",
+                'save_failed': " [保存失败]",
+                'save_failed_status': "保存失败: {} ({})",
                 'current_angle': "当前角度: {:.2f}°",
                 'single_rotation': "单次旋转: {}°",
                 'bg_color': "填充色: {},{},{}",
@@ -127,6 +163,10 @@ class Internationalization:
                 'hough_standard': "标准",
                 'hough_probabilistic': "概率",
                 'hough_optimized': "优化",
+                'hough_projection': "投影",
+                'hough_fourier': "频谱",
+                'hough_tiles': "分块",
+                'hough_cascade': "级联",
                 
                 # 文件对话框
                 'select_folder_title': "选择文件夹",
@@ -147,13 +187,20 @@ class Internationalization:
                 'select_folder_or_drag': "Please select folder or open pictures",
                 'select_folder_only': "Please select folder (drag & drop requires tkinterdnd2)",
                 'auto_deskewing': "Auto-deskewing current picture...",
-                'auto_deskew_complete': "Auto-deskewion complete, rotation angle: {:.2f}°",
+                'auto_deskew_complete': "Auto-deskewion complete, rotation angle: {:.2f}° (confidence {:.0%})",
                 'no_rotation_needed': "Auto-deskewion complete, no rotation needed",
+                'no_lines_detected': "No text lines detected, picture not rotated",
+                'rotation_engine': "Rotation engine: {} / {}",
+                'encoder_preset': "Output encoder: {}",
+                'unchanged_output': "Unchanged pictures in Deskew folder: {}",
                 'batch_deskewing': "Batch deskewing...",
                 'batch_complete': "Batch deskewion complete, processed {} pictures",
                 'batch_stopped': "Batch deskewion stopped, processed {}/{} pictures",
                 'current_image': "Current picture: {}",
                 'modified': " [Modified]",
+                'save_pending': " [Saving]",
+                'save_failed': " [Save failed]",
+                'save_failed_status': "Save failed: {} ({})",
                 'current_angle': "Current angle: {:.2f}°",
                 'single_rotation': "Single rotation: {}°",
                 'bg_color': "Background: {},{},{}",
@@ -205,6 +252,10 @@ class Internationalization:
                 'hough_standard': "Standard",
                 'hough_probabilistic': "Probabilistic",
                 'hough_optimized': "Optimized",
+                'hough_projection': "Projection",
+                'hough_fourier': "Fourier",
+                'hough_tiles': "Tiles",
+                'hough_cascade': "Cascade",
                 
                 # File dialogs
                 'select_folder_title': "Select Folder",
@@ -242,282 +293,25 @@ class Internationalization:
             return key
 
 
-class AutoDeskewer:
+class AutoDeskewer(DeskewDetector):
     """自动纠偏功能类 - 使用霍夫变换方法"""
     
     def __init__(self, app):
+        super().__init__()
         self.app = app
         self.is_batch_deskewing = False
         self.stop_batch_deskewion = False
-        self.hough_method = "optimized"  # 默认使用优化版霍夫变换
-    
-    def preprocess_image(self, pil_image):
-        """预处理PIL图像：转灰度、二值化"""
-        # 将PIL图像转换为OpenCV格式
-        opencv_image = np.array(pil_image)
-        if len(opencv_image.shape) == 3:
-            if opencv_image.shape[2] == 4:  # RGBA转RGB
-                opencv_image = cv2.cvtColor(opencv_image, cv2.COLOR_RGBA2RGB)
-            opencv_image = cv2.cvtColor(opencv_image, cv2.COLOR_RGB2GRAY)
-        
-        _, binary = cv2.threshold(opencv_image, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        binary = 255 - binary  # 背景白色=255，文本黑色=0
-        return binary
-    
-    def detect_angle_hough(self, binary, angle_range=(-30, 30), rho_resolution=1, theta_resolution=np.pi/180, threshold=100):
-        """使用标准霍夫变换检测文本行角度"""
-        # 边缘检测
-        edges = cv2.Canny(binary, 50, 150, apertureSize=3)
-        
-        # 霍夫直线检测
-        lines = cv2.HoughLines(edges, rho_resolution, theta_resolution, threshold)
-        
-        if lines is None:
-            print("Hough transform detected no lines")
-            return 0
-        
-        # 转换角度并筛选
-        angles = []
-        for line in lines:
-            rho, theta = line[0]
-            
-            # 将theta转换为角度（度）
-            angle_deg = np.degrees(theta) - 90  # 转换为水平线的角度
-            
-            # 调整角度到[-90, 90)范围
-            if angle_deg < -90:
-                angle_deg += 180
-            elif angle_deg >= 90:
-                angle_deg -= 180
-                
-            # 只保留在指定范围内的角度
-            if angle_range[0] <= angle_deg <= angle_range[1]:
-                angles.append(angle_deg)
-        
-        if not angles:
-            print("No lines found in specified range")
-            return 0
-        
-        # 使用直方图找到最集中的角度
-        hist, bins = np.histogram(angles, bins=30, range=angle_range)
-        peak_bin = np.argmax(hist)
-        peak_angle = (bins[peak_bin] + bins[peak_bin+1]) / 2
-        
-        print(f"Standard Hough detected {len(angles)} lines")
-        print(f"Most concentrated angle: {peak_angle:.2f}°")
-        
-        return peak_angle
-    
-    def detect_angle_hough_probabilistic(self, binary, angle_range=(-30, 30), threshold=50, min_line_length=50, max_line_gap=10):
-        """使用概率霍夫变换检测文本行角度"""
-        # 边缘检测
-        edges = cv2.Canny(binary, 50, 150, apertureSize=3)
-        
-        # 概率霍夫直线检测（返回线段端点）
-        lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold, 
-                               minLineLength=min_line_length, maxLineGap=max_line_gap)
-        
-        if lines is None:
-            print("Probabilistic Hough detected no lines")
-            return 0
-        
-        # 计算每条线段的角度
-        angles = []
-        lengths = []
-        
-        for line in lines:
-            x1, y1, x2, y2 = line[0]
-            
-            # 计算线段角度
-            dx = x2 - x1
-            dy = y2 - y1
-            
-            if dx == 0:  # 垂直线
-                angle_deg = 90
-            else:
-                angle_rad = math.atan2(dy, dx)
-                angle_deg = math.degrees(angle_rad)
-                
-            # 调整角度到[-90, 90)范围
-            if angle_deg < -90:
-                angle_deg += 180
-            elif angle_deg >= 90:
-                angle_deg -= 180
-                
-            # 只保留在指定范围内的角度
-            if angle_range[0] <= angle_deg <= angle_range[1]:
-                angles.append(angle_deg)
-                # 计算线段长度作为权重
-                length = math.sqrt(dx*dx + dy*dy)
-                lengths.append(length)
-        
-        if not angles:
-            print("No lines found in specified range")
-            return 0
-        
-        # 使用加权平均（线段长度作为权重）
-        total_length = sum(lengths)
-        weighted_angle = sum(angle * length for angle, length in zip(angles, lengths)) / total_length
-        
-        print(f"Probabilistic Hough detected {len(angles)} line segments")
-        print(f"Weighted average angle: {weighted_angle:.2f}°")
-        
-        return weighted_angle
-    
-    def detect_angle_hough_optimized(self, binary, angle_range=(-30, 30)):
-        """优化版的霍夫变换角度检测"""
-        h, w = binary.shape
-        
-        # 1. 预处理 - 使用形态学操作增强文本行
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 1))  # 水平核，增强水平特征
-        enhanced = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-        
-        # 2. 边缘检测
-        edges = cv2.Canny(enhanced, 50, 150, apertureSize=3)
-        
-        # 3. 概率霍夫变换，参数根据图像大小自适应
-        min_line_length = max(50, w * 0.3)  # 最小线段长度为图像宽度的30%
-        threshold = max(50, w * 0.1)  # 阈值根据图像宽度调整
-        
-        lines = cv2.HoughLinesP(edges, 1, np.pi/180, int(threshold), 
-                               minLineLength=int(min_line_length), maxLineGap=20)
-        
-        if lines is None:
-            print("Hough transform detected no lines, trying lower threshold...")
-            # 降低阈值再次尝试
-            lines = cv2.HoughLinesP(edges, 1, np.pi/180, int(threshold * 0.5), 
-                                   minLineLength=int(min_line_length * 0.5), maxLineGap=30)
-            
-            if lines is None:
-                print("Still no lines detected, returning 0 degrees")
-                return 0
-        
-        # 4. 计算每条线段的角度和权重
-        angles = []
-        weights = []
-        
-        for line in lines:
-            x1, y1, x2, y2 = line[0]
-            
-            # 计算线段角度
-            dx = x2 - x1
-            dy = y2 - y1
-            
-            if abs(dx) < 1:  # 接近垂直线
-                continue
-                
-            angle_rad = math.atan2(dy, dx)
-            angle_deg = math.degrees(angle_rad)
-            
-            # 调整角度到[-90, 90)范围
-            if angle_deg < -90:
-                angle_deg += 180
-            elif angle_deg >= 90:
-                angle_deg -= 180
-                
-            # 只保留在指定范围内的角度
-            if angle_range[0] <= angle_deg <= angle_range[1]:
-                # 计算线段长度和水平投影作为权重
-                length = math.sqrt(dx*dx + dy*dy)
-                horizontal_projection = abs(dx)  # 水平投影长度
-                
-                # 综合权重：长度 + 水平投影
-                weight = length + horizontal_projection * 0.5
-                
-                angles.append(angle_deg)
-                weights.append(weight)
-        
-        if not angles:
-            print("No lines found in specified range")
-            return 0
-        
-        # 5. 使用加权平均
-        total_weight = sum(weights)
-        weighted_angle = sum(angle * weight for angle, weight in zip(angles, weights)) / total_weight
-        
-        print(f"Optimized Hough detected {len(angles)} line segments")
-        print(f"Weighted average angle: {weighted_angle:.2f}°")
-        
-        return weighted_angle
-    
-    def calculate_rotation_angle_by_two_points(self, point1, point2):
-        """完全按照您提供的两点法计算旋转角度"""
-        x1, y1 = point1
-        x2, y2 = point2
-        
-        # 计算两点距离
-        dx = x2 - x1
-        dy = y2 - y1
-        
-        # 计算直线与水平线的夹角
-        angle_rad = math.atan2(dy, dx)
-        angle_deg = math.degrees(angle_rad)
-        
-        # 判断是水平矫正还是垂直矫正
-        if abs(dx) > abs(dy):  # 横向距离大于纵向距离 - 水平矫正
-            target_angle = angle_deg
-        else:  # 纵向距离大于横向距离 - 垂直矫正
-            if x1 > x2:  # 上点更靠右
-                target_angle = -(90 - angle_deg)
-            else:  # 下点更靠右
-                target_angle = -(90 - angle_deg)
-        
-        return target_angle
+        self.batch_pipeline = None
+        self.angle_cache_folder = None
     
-    def set_hough_method(self, method):
-        """设置霍夫变换方法"""
-        valid_methods = ["standard", "probabilistic", "optimized"]
-        if method in valid_methods:
-            self.hough_method = method
-            print(f"Switched to {method} Hough method")
-        else:
-            print(f"Invalid Hough method: {method}")
-    
-    def auto_deskew_image(self, pil_image):
-        """自动纠偏单张图片 - 使用霍夫变换方法"""
-        try:
-            # 1. 预处理图像
-            binary = self.preprocess_image(pil_image)
-            h, w = binary.shape
-            
-            # 2. 使用霍夫变换检测角度
-            detected_angle = 0
-            if self.hough_method == "standard":
-                detected_angle = self.detect_angle_hough(binary)
-                method_name = "Standard Hough"
-            elif self.hough_method == "probabilistic":
-                detected_angle = self.detect_angle_hough_probabilistic(binary)
-                method_name = "Probabilistic Hough"
-            else:  # optimized
-                detected_angle = self.detect_angle_hough_optimized(binary)
-                method_name = "Optimized Hough"
-            
-            print(f"{method_name} detected angle: {detected_angle:.2f}°")
-            
-            # 3. 使用两点法计算旋转角度
-            center_x, center_y = w // 2, h // 2
-            distance = min(w, h) // 4
-            
-            angle_rad = math.radians(detected_angle)
-            point1 = (
-                int(center_x - distance * math.cos(angle_rad)),
-                int(center_y - distance * math.sin(angle_rad))
-            )
-            point2 = (
-                int(center_x + distance * math.cos(angle_rad)),
-                int(center_y + distance * math.sin(angle_rad))
-            )
-            
-            rotation_angle = self.calculate_rotation_angle_by_two_points(point1, point2)
-            print(f"Two-point method calculated rotation angle: {rotation_angle:.2f}°")
-            
-            return rotation_angle
-            
-        except Exception as e:
-            print(f"Error in auto-deskewion: {e}")
-            import traceback
-            traceback.print_exc()
-            return 0
+    def _open_angle_cache(self):
+        """打开当前文件夹的角度缓存（位于Deskew文件夹），切换文件夹时重新打开"""
+        deskew_folder = os.path.join(self.app.image_folder, DESKEW_FOLDER_NAME)
+        if self.angle_cache_folder != deskew_folder:
+            if self.angle_cache is not None:
+                self.angle_cache.close()
+            self.angle_cache = AngleCache.for_folder(deskew_folder)
+            self.angle_cache_folder = deskew_folder
     
     def auto_deskew_current(self):
         """自动纠偏当前图片"""
@@ -533,16 +327,24 @@ class AutoDeskewer:
         self.app.root.update()
         
         # 获取当前图片和背景色
-        current_image = self.app.image
+        self.app.flush_pending_rotation()
+        current_image = self.app.ensure_full_image()
         bg_color = self.app.bg_color
         
-        # 执行自动纠偏
-        rotation_angle = self.auto_deskew_image(current_image)
+        # 执行自动纠偏（相同内容与方法的检测结果从缓存读取）
+        self._open_angle_cache()
+        result = self.analyze_image(current_image)
+        rotation_angle = result.rotation_angle
         
-        if abs(rotation_angle) > 0.1:  # 只有角度大于0.1度时才旋转
+        if result.fallback:
+            # 区分"未检测到直线"与"检测结果为0°"
+            self.app.status_label.config(text=self.app._("no_lines_detected"))
+        elif abs(rotation_angle) > MIN_ROTATION_ANGLE:  # 只有角度大于0.1度时才旋转
             # 使用图片转转的旋转逻辑
             self.app.rotate_by_angle(rotation_angle)
-            self.app.status_label.config(text=self.app._("auto_deskew_complete", rotation_angle))
+            self.app.flush_pending_rotation()
+            self.app.status_label.config(
+                text=self.app._("auto_deskew_complete", rotation_angle, result.confidence))
         else:
             self.app.status_label.config(text=self.app._("no_rotation_needed"))
     
@@ -556,8 +358,10 @@ class AutoDeskewer:
             return
         
         if self.is_batch_deskewing:
-            # 如果正在批量纠偏，则停止
+            # 如果正在批量纠偏，则停止（正在处理的图片完成后立即结束）
             self.stop_batch_deskewion = True
+            if self.batch_pipeline:
+                self.batch_pipeline.stop()
             self.app.status_label.config(text=self.app._("batch_deskewing"))
             return
         
@@ -572,77 +376,94 @@ class AutoDeskewer:
         ):
             return
         
-        # 启动批量纠偏线程
+        # 先保存当前图片的手动修改并等待后台写完，工作进程从Deskew文件夹读取
+        self.app.save_current_image_if_modified()
+        self.app.save_queue.wait()
+        self.app.drain_finished_saves()
+        
+        # 每张图片一个任务，参数在启动时确定
+        tasks = [
+            {
+                'index': i,
+                'filename': self.app.image_files[i],
+                'source_path': os.path.join(self.app.image_folder, self.app.image_files[i]),
+                'output_folder': os.path.join(self.app.image_folder, DESKEW_FOLDER_NAME),
+                'hough_method': self.hough_method,
+                'bg_color': self.app.bg_color,
+                'lock_size': self.app.size_lock_manager.lock_size,
+                'use_existing_copy': True,
+                'use_pyramid': self.use_pyramid,
+                'angle_cache': os.path.join(self.app.image_folder, DESKEW_FOLDER_NAME,
+                                            ANGLE_CACHE_FILENAME),
+                'rotation_backend': self.app.rotation_backend,
+                'resample': self.app.resample,
+                'encoder_preset': self.app.encoder_preset,
+                'unchanged_output': self.app.unchanged_output
+            }
+            for i in range(start_index, total_count)
+        ]
+        
+        # 启动批量纠偏流水线，界面只接收进度事件：流水线线程不调用 Tk，事件放入队列由主线程轮询
         self.is_batch_deskewing = True
         self.stop_batch_deskewion = False
-        threading.Thread(target=self._batch_deskew_thread, daemon=True).start()
-    
-    def _batch_deskew_thread(self):
-        """批量纠偏线程 - 从当前图片开始"""
-        total_count = len(self.app.image_files)
-        start_index = self.app.current_image_index  # 从当前图片开始
-        processed_count = 0
-        
-        for i in range(start_index, total_count):
-            if self.stop_batch_deskewion:
-                break
-            
-            # 切换到当前图片
-            self.app.root.after(0, lambda idx=i: self._switch_to_image(idx))
-            
-            # 等待图片加载
-            import time
-            time.sleep(0.5)
-            
-            # 执行自动纠偏
-            self.app.root.after(0, self._deskew_current_in_batch)
-            
-            # 等待纠偏完成
-            time.sleep(0.5)
-            
-            # 保存并切换到下一张（模拟手动切换）
-            self.app.root.after(0, self._save_and_next_in_batch)
-            
-            # 等待保存完成
-            time.sleep(0.3)
-            
-            processed_count += 1
-            
-            # 更新状态 - 显示从当前开始的进度
-            progress = f"Batch progress: {processed_count}/{total_count - start_index} (from #{start_index + 1})"
-            self.app.root.after(0, lambda p=progress: self.app.status_label.config(text=p))
-        
-        # 批量纠偏完成
-        self.app.root.after(0, self._batch_deskewion_finished, processed_count, total_count - start_index)
-    
-    def _switch_to_image(self, index):
-        """切换到指定索引的图片，并确保缩略图可见"""
-        self.app.current_image_index = index
-        self.app.load_current_image()
-        self.app.update_thumbnails_selection()
-        
-        # 立即滚动到当前缩略图，确保可见
-        self.app.root.after(100, self.app.scroll_to_current_thumbnail)
+        events = queue.SimpleQueue()
+        self.batch_pipeline = BatchDeskewPipeline(
+            tasks,
+            on_progress=lambda result, processed, total: events.put(
+                (self._on_batch_progress, (result, processed, total, start_index))),
+            on_finished=lambda processed, total: events.put(
+                (self._batch_deskewion_finished, (processed, total)))
+        )
+        self.batch_pipeline.start()
+        self.app.root.after(BATCH_POLL_MS, self._poll_batch_events, self.batch_pipeline, events)
     
-    def _deskew_current_in_batch(self):
-        """在批量纠偏中纠偏当前图片"""
-        if self.app.image:
-            current_image = self.app.image
-            bg_color = self.app.bg_color
-            
-            rotation_angle = self.auto_deskew_image(current_image)
-            
-            if abs(rotation_angle) > 0.1:
-                self.app.rotate_by_angle(rotation_angle)
+    def _poll_batch_events(self, pipeline, events):
+        """定时处理批量纠偏的进度事件（主线程），处理完结束事件或已开始新的批量纠偏时停止轮询"""
+        while pipeline is self.batch_pipeline:
+            try:
+                handler, args = events.get_nowait()
+            except queue.Empty:
+                self.app.root.after(BATCH_POLL_MS, self._poll_batch_events, pipeline, events)
+                return
+            handler(*args)
     
-    def _save_and_next_in_batch(self):
-        """在批量纠偏中保存当前图片"""
-        self.app.save_current_image_if_modified()
+    def _on_batch_progress(self, result, processed, batch_total, start_index):
+        """处理单张图片的纠偏结果（在界面线程中运行）"""
+        if not self.is_batch_deskewing:
+            return
+        
+        index = result['index']
+        if result['error'] is None and index < len(self.app.image_files):
+            # 批量纠偏期间对当前图片的手动修改保留，修改标记随文件名转移
+            modified = (index == self.app.current_image_index and
+                        self.app.image_modified.pop(result['filename'], False))
+            # 更新文件列表（如果格式改变）
+            if result['saved_filename'] != result['filename']:
+                self.app.image_files[index] = result['saved_filename']
+            self.app.image_modified[result['saved_filename']] = modified
+            
+            # 只刷新发生变化的缩略图
+            if abs(result['angle']) > MIN_ROTATION_ANGLE:
+                self.app.update_thumbnail_at(index)
+        
+        # 更新状态 - 显示从当前开始的进度
+        progress = f"Batch progress: {processed}/{batch_total} (from #{start_index + 1})"
+        self.app.status_label.config(text=progress)
     
     def _batch_deskewion_finished(self, processed, batch_total):
         """批量纠偏完成处理"""
+        was_batch_deskewing = self.is_batch_deskewing
         self.is_batch_deskewing = False
         self.stop_batch_deskewion = False
+        self.batch_pipeline = None
+        
+        # 软件已被重置则不再刷新界面
+        if not was_batch_deskewing:
+            return
+        
+        # 重新加载当前图片，显示纠偏后的结果；批量纠偏期间手动修改过的当前图片不重新加载，保留修改
+        if not self.app.image_modified.get(self.app.current_filename(), False):
+            self.app.load_current_image()
         
         if processed == batch_total:
             self.app.status_label.config(text=self.app._("batch_complete", processed))
@@ -708,6 +529,89 @@ class ImageDisplayManager:
         }
 
 
+class DisplayPyramid:
+    """显示金字塔 - 第 0 级为显示来源图，后台线程逐级按 2 倍缩小生成其余各级
+    
+    显示时从分辨率不低于显示分辨率的最小一级重采样；渲染好的图块按 (级别, 显示尺寸, 图块坐标)
+    放入 LRU 缓存，反复缩放和平移到同一区域时直接取缓存。只在主线程中渲染。
+    """
+    
+    MODES = ('L', 'LA', 'RGB', 'RGBA')  # Image.reduce 支持的模式
+    
+    def __init__(self, source):
+        self.source = source
+        self.levels = [source]
+        self.tiles = OrderedDict()  # (级别, 显示宽, 显示高, 图块列, 图块行) -> 图块
+        self.tile_bytes = 0
+        self._lock = threading.Lock()
+        self._cancelled = False
+    
+    def start(self):
+        """来源图足够大时在后台线程中生成各级"""
+        if max(self.source.size) // 2 >= PYRAMID_MIN_SIZE:
+            threading.Thread(target=self._build, daemon=True).start()
+    
+    def cancel(self):
+        self._cancelled = True
+    
+    def _build(self):
+        level = self.source
+        while max(level.size) // 2 >= PYRAMID_MIN_SIZE and not self._cancelled:
+            level = level.reduce(2)
+            with self._lock:
+                self.levels.append(level)
+    
+    def level_for(self, scale):
+        """已生成的各级中，分辨率不低于显示分辨率的最小一级，返回 (级别, 图片)"""
+        with self._lock:
+            levels = list(self.levels)
+        index = 0
+        while index + 1 < len(levels) and levels[index + 1].width >= self.source.width * scale:
+            index += 1
+        return index, levels[index]
+    
+    def render(self, region, display_width, display_height, resample_for):
+        """按图块拼出显示区域 region（相对整幅显示图的 left, top, right, bottom）
+        
+        resample_for(来源像素数, 显示像素数) 返回重采样方法。
+        """
+        index, level = self.level_for(display_width / self.source.width)
+        resample = resample_for(level.width * level.height, display_width * display_height)
+        left, top, right, bottom = region
+        size = DISPLAY_TILE_SIZE
+        viewport = Image.new(level.mode, (right - left, bottom - top))
+        for row in range(top // size, (bottom - 1) // size + 1):
+            for column in range(left // size, (right - 1) // size + 1):
+                key = (index, display_width, display_height, column, row)
+                tile = self.tiles.get(key)
+                if tile is None:
+                    tile = self._render_tile(level, column, row, display_width, display_height, resample)
+                    self._cache_tile(key, tile)
+                else:
+                    self.tiles.move_to_end(key)
+                viewport.paste(tile, (column * size - left, row * size - top))
+        return viewport
+    
+    def _render_tile(self, level, column, row, display_width, display_height, resample):
+        """从某一级重采样出一个图块（box 之外的邻近像素也参与插值，图块之间没有接缝）"""
+        size = DISPLAY_TILE_SIZE
+        x0, y0 = column * size, row * size
+        x1, y1 = min(x0 + size, display_width), min(y0 + size, display_height)
+        scale_x = level.width / display_width
+        scale_y = level.height / display_height
+        if (display_width, display_height) == level.size:
+            return level.crop((x0, y0, x1, y1))
+        box = (x0 * scale_x, y0 * scale_y, x1 * scale_x, y1 * scale_y)
+        return level.resize((x1 - x0, y1 - y0), resample, box=box)
+    
+    def _cache_tile(self, key, tile):
+        self.tiles[key] = tile
+        self.tile_bytes += image_nbytes(tile)
+        while self.tile_bytes > TILE_CACHE_MAX_BYTES and len(self.tiles) > 1:
+            _, old = self.tiles.popitem(last=False)
+            self.tile_bytes -= image_nbytes(old)
+
+
 class PointManager:
     """管理点选择和连线功能"""
     
@@ -945,41 +849,18 @@ class SizeLockManager:
             if self.lock_size and self.original_size is None:
                 # 第一次锁定，记录原始尺寸
                 self.original_size = self.app.original_image.size
+            self.app.flush_pending_rotation()
+            if self.app.rotation_angle:
+                # 锁定时旋转结果直接输出原始尺寸，切换后需按新状态重新生成
+                self.app.update_rotation(self.app.rotation_angle)
+                self.app.display_image()
             self.app.update_status()
             
     def crop_to_original_size(self, image):
         """将图片裁切回原始尺寸"""
-        if not self.lock_size or self.original_size is None:
+        if not self.lock_size or self.original_size is None or image.size == self.original_size:
             return image
-            
-        original_width, original_height = self.original_size
-        current_width, current_height = image.size
-        
-        # 计算裁切区域（居中裁切）
-        left = (current_width - original_width) // 2
-        top = (current_height - original_height) // 2
-        right = left + original_width
-        bottom = top + original_height
-        
-        # 确保裁切区域在图片范围内
-        left = max(0, left)
-        top = max(0, top)
-        right = min(current_width, right)
-        bottom = min(current_height, bottom)
-        
-        # 如果裁切区域小于原始尺寸，需要填充
-        if (right - left) < original_width or (bottom - top) < original_height:
-            # 创建新图片并填充背景色
-            new_image = Image.new('RGB', self.original_size, self.app.bg_color)
-            # 将裁切的部分粘贴到新图片中
-            paste_x = (original_width - (right - left)) // 2
-            paste_y = (original_height - (bottom - top)) // 2
-            cropped = image.crop((left, top, right, bottom))
-            new_image.paste(cropped, (paste_x, paste_y))
-            return new_image
-        else:
-            # 直接裁切
-            return image.crop((left, top, right, bottom))
+        return crop_to_size(image, self.original_size, self.app.bg_color)
     
     def should_show_warning(self):
         """检查是否需要显示警告"""
@@ -1046,6 +927,9 @@ class AdvancedImageRotator:
         y = (screen_height - height) // 2
         self.root.geometry(f"+{x}+{y}")
         
+        # 关闭窗口前写完后台保存队列
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
         self._set_window_icon()
 
     def _set_window_icon(self):
@@ -1090,6 +974,19 @@ class AdvancedImageRotator:
         self.thumbnail_manager = ThumbnailManager(self)
         self.angle_input_manager = AngleInputManager(self)
         self.size_lock_manager = SizeLockManager(self)
+        # 后台保存队列：切换图片时不等待编码。写入线程不调用 Tk（主线程可能正在 wait 中），
+        # 只把结果放入队列，由主线程定时取出处理
+        self.finished_saves = queue.SimpleQueue()
+        self.save_queue = BackgroundSaver(
+            on_saved=lambda key, saved_filename: self.finished_saves.put((key, saved_filename, None)),
+            on_failed=lambda key, error: self.finished_saves.put((key, None, error))
+        )
+        self.root.after(SAVE_POLL_MS, self._poll_finished_saves)
+        # 预解码前后几张图片（连同显示用的代理图）放入内存缓存，翻页时不再等待解码
+        screen_size = max(self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+        self.prefetcher = ImagePrefetcher(
+            DecodedImageCache(), prepare=lambda image: preview_source_for(image, screen_size)
+        )
 
     def _initialize_variables(self):
         """初始化变量"""
@@ -1098,10 +995,31 @@ class AdvancedImageRotator:
         self.current_image_index = -1
         self.image = None
         self.photo = None
+        self._photo_key = None  # 当前 PhotoImage 的 (尺寸, 模式)，相同时复用
+        self.display_pyramid = None  # 当前显示来源图的金字塔和图块缓存
+        self._checkerboard = None  # 画布大小的棋盘格背景，画布尺寸变化时重新生成
         self.original_image = None
         self.rotation_angle = 0
         self.bg_color = DEFAULT_BG_COLOR
         self.image_modified = {}
+        self.save_state = {}  # 文件名 -> "pending"（保存中）或 "failed"（保存失败）
+        self.pending_saves = {}  # 文件名 -> 保存中的旋转角度，保存完成后才改名并清除修改标记
+        self.failed_rotations = {}  # 文件名 -> 保存失败的旋转角度，再次加载时恢复以便重新保存
+        self._thumbnail_generation = {}  # 文件名 -> 最近一次缩略图刷新请求的序号
+        # 交互旋转只旋转缩小的代理图，全分辨率结果在保存或放大时才生成
+        self.preview_source = None  # 原图按整数倍缩小的代理图（原图不大于屏幕时为 None）
+        self.preview_factor = 1
+        self.preview_image = None  # 旋转后的代理图
+        self.pending_size = None  # 待生成的全分辨率结果尺寸
+        self.full_render_pending = False
+        # 连续旋转按键只累加目标角度，每帧最多渲染一次
+        self.target_angle = 0
+        self._rotation_timer = None
+        self.rotation_backend = DEFAULT_ROTATION_BACKEND  # 旋转引擎（K 键切换）
+        self.resample = "bicubic"
+        self.encoder_preset = DEFAULT_ENCODER_PRESET  # 输出编码预设（J 键切换）
+        self.navigation_direction = 1  # 最近一次翻页的方向（1 向后，-1 向前），决定预解码顺序
+        self.unchanged_output = DEFAULT_UNCHANGED_OUTPUT  # 未修改图片的输出方式（U 键切换）
 
         # 启用PIL对所有格式的支持
         ImageFile.LOAD_TRUNCATED_IMAGES = True
@@ -1435,11 +1353,7 @@ class AdvancedImageRotator:
 
     def _natural_sort(self, files):
         """自然排序算法"""
-        def natural_sort_key(filename):
-            parts = re.split(r'(\d+)', filename)
-            return [int(part) if part.isdigit() else part.lower() for part in parts]
-        
-        return sorted(files, key=natural_sort_key)
+        return natural_sort(files)
 
     def load_files(self, file_paths):
         """加载多个文件"""
@@ -1469,6 +1383,8 @@ class AdvancedImageRotator:
         """初始化图片加载"""
         self.thumbnail_manager.cache = {}
         self.image_modified = {}
+        self.pending_saves = {}
+        self.failed_rotations = {}
         
         # 显示缩略图区域
         thumbs_frame = self.thumbnail_frame.master
@@ -1536,39 +1452,38 @@ class AdvancedImageRotator:
         
         self.root.after(0, self.scroll_to_current_thumbnail)
 
-    def _load_thumbnail_image(self, file_path):
-        """加载缩略图图片 - 智能缓存方案"""
-        filename = os.path.basename(file_path)
-        folder_path = os.path.dirname(file_path)
+    def _thumbnail_cache_key(self, file_path):
+        """返回缩略图的实际来源（与加载相同：优先Deskew文件夹中的输出）和缓存键"""
+        actual_file_path, file_stat = resolve_image_file(os.path.dirname(file_path), os.path.basename(file_path))
+        file_mtime = file_stat.st_mtime
         
-        # 检查Deskew文件夹中的文件
-        deskew_file_path = os.path.join(folder_path, "Deskew", filename)
+        # 使用文件路径和修改时间作为缓存键
+        return actual_file_path, f"{actual_file_path}_{file_mtime}_{self.thumbnail_manager.size}"
+
+    def _render_thumbnail(self, actual_file_path):
+        """解码并缩小为缩略图（不涉及 Tk，可在后台线程中运行）"""
+        img = Image.open(actual_file_path)
+        img_width, img_height = img.size
         
-        # 确定实际文件路径和修改时间
-        if os.path.exists(deskew_file_path):
-            actual_file_path = deskew_file_path
-            file_mtime = os.path.getmtime(deskew_file_path)
-        else:
-            actual_file_path = file_path
-            file_mtime = os.path.getmtime(file_path)
+        # 计算缩略图尺寸
+        thumb_height = self.thumbnail_manager.size
+        thumb_width = int(img_width * thumb_height / img_height)
         
-        # 使用文件路径和修改时间作为缓存键
-        cache_key = f"{actual_file_path}_{file_mtime}_{self.thumbnail_manager.size}"
+        # JPEG 直接按缩小比例解码
+        img.draft(None, (thumb_width * 2, thumb_height * 2))
+        return img.resize((thumb_width, thumb_height), Image.Resampling.LANCZOS)
+
+    def _load_thumbnail_image(self, file_path):
+        """加载缩略图图片 - 智能缓存方案"""
+        filename = os.path.basename(file_path)
+        actual_file_path, cache_key = self._thumbnail_cache_key(file_path)
         
         # 检查缓存
         if cache_key in self.thumbnail_manager.cache:
             return self.thumbnail_manager.cache[cache_key]
         
         try:
-            img = Image.open(actual_file_path)
-            img_width, img_height = img.size
-            
-            # 计算缩略图尺寸
-            thumb_height = self.thumbnail_manager.size
-            thumb_width = int(img_width * thumb_height / img_height)
-            
-            img = img.resize((thumb_width, thumb_height), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
+            photo = ImageTk.PhotoImage(self._render_thumbnail(actual_file_path))
             
             # 缓存结果
             self.thumbnail_manager.cache[cache_key] = photo
@@ -1594,37 +1509,63 @@ class AdvancedImageRotator:
 
     def update_current_thumbnail(self):
         """更新当前缩略图显示 - 高效版本"""
-        if 0 <= self.current_image_index < len(self.thumbnail_manager.buttons):
-            filename = self.image_files[self.current_image_index]
+        self.update_thumbnail_at(self.current_image_index)
+
+    def update_thumbnail_at(self, index):
+        """重新生成指定索引的缩略图：后台线程解码缩小，完成后在主线程替换，其余缓存保持不变"""
+        if 0 <= index < len(self.thumbnail_manager.buttons):
+            filename = self.image_files[index]
             file_path = os.path.join(self.image_folder, filename)
-            
-            # 强制清除当前缩略图的缓存
-            deskew_file_path = os.path.join(self.image_folder, "Deskew", filename)
-            cache_keys_to_remove = []
-            
-            for cache_key in self.thumbnail_manager.cache:
-                if filename in cache_key:
-                    cache_keys_to_remove.append(cache_key)
-            
-            for key in cache_keys_to_remove:
-                del self.thumbnail_manager.cache[key]
-            
-            # 重新加载缩略图
-            photo = self._load_thumbnail_image(file_path)
-            
-            if photo:
-                btn = self.thumbnail_manager.buttons[self.current_image_index]
-                btn.config(
-                    image=photo, 
-                    text="", 
-                    width=photo.width(), 
-                    height=photo.height()
-                )
-                # 保存引用防止被垃圾回收
-                if self.current_image_index < len(self.thumbnail_manager.images):
-                    self.thumbnail_manager.images[self.current_image_index] = photo
-                else:
-                    self.thumbnail_manager.images.append(photo)
+            # 同一文件连续保存时只采用最后一次请求的结果
+            generation = self._thumbnail_generation.get(filename, 0) + 1
+            self._thumbnail_generation[filename] = generation
+            threading.Thread(
+                target=self._refresh_thumbnail_thread, args=(filename, file_path, generation), daemon=True
+            ).start()
+
+    def _refresh_thumbnail_thread(self, filename, file_path, generation):
+        """后台线程：生成单个文件的缩略图"""
+        try:
+            actual_file_path, cache_key = self._thumbnail_cache_key(file_path)
+            thumbnail = self._render_thumbnail(actual_file_path)
+        except Exception as e:
+            print(f"无法加载缩略图 {filename}: {str(e)}")
+            return
+        self.root.after(0, self._swap_thumbnail, filename, file_path, generation, cache_key, thumbnail)
+
+    def _swap_thumbnail(self, filename, file_path, generation, cache_key, thumbnail):
+        """主线程：替换单个缩略图，只删除该文件的旧缓存"""
+        if (self._thumbnail_generation.get(filename) != generation or filename not in self.image_files
+                or os.path.dirname(file_path) != self.image_folder):
+            # 已有更新的请求，或已切换文件夹
+            return
+        index = self.image_files.index(filename)
+        if index >= len(self.thumbnail_manager.buttons):
+            return
+        
+        # 强制清除该缩略图的旧缓存（原图和Deskew副本两种来源）
+        deskew_file_path = os.path.join(self.image_folder, DESKEW_FOLDER_NAME, filename)
+        stale_keys = [key for key in self.thumbnail_manager.cache
+                      if key.startswith((file_path + "_", deskew_file_path + "_"))]
+        for key in stale_keys:
+            del self.thumbnail_manager.cache[key]
+        
+        photo = ImageTk.PhotoImage(thumbnail)
+        self.thumbnail_manager.cache[cache_key] = photo
+        self._clean_thumbnail_cache()
+        
+        btn = self.thumbnail_manager.buttons[index]
+        btn.config(
+            image=photo, 
+            text="", 
+            width=photo.width(), 
+            height=photo.height()
+        )
+        # 保存引用防止被垃圾回收
+        if index < len(self.thumbnail_manager.images):
+            self.thumbnail_manager.images[index] = photo
+        else:
+            self.thumbnail_manager.images.append(photo)
 
     def scroll_to_current_thumbnail(self):
         """滚动到当前选中的缩略图"""
@@ -1664,8 +1605,13 @@ class AdvancedImageRotator:
     def update_thumbnails_selection(self):
         """更新缩略图选中状态"""
         for i, btn in enumerate(self.thumbnail_manager.buttons):
-            if i == self.current_image_index:
+            save_state = self.save_state.get(self.image_files[i]) if i < len(self.image_files) else None
+            if save_state == "failed":
+                btn.config(relief=tk.SUNKEN if i == self.current_image_index else tk.RAISED, bg="salmon")
+            elif i == self.current_image_index:
                 btn.config(relief=tk.SUNKEN, bg="light blue")
+            elif save_state == "pending":
+                btn.config(relief=tk.RAISED, bg="light yellow")
             else:
                 btn.config(relief=tk.RAISED, bg="SystemButtonFace")
 
@@ -1694,7 +1640,7 @@ class AdvancedImageRotator:
         self.zoom_out()
 
     def load_current_image(self):
-        """加载当前图片 - 自动创建Deskew文件夹副本"""
+        """加载当前图片 - Deskew文件夹中已有输出时加载输出，否则直接读取原图"""
         self.canvas.delete("prompt")
         self.point_manager.reset_points()
         
@@ -1702,39 +1648,62 @@ class AdvancedImageRotator:
             filename = self.image_files[self.current_image_index]
             original_file_path = os.path.join(self.image_folder, filename)
             
-            # 创建Deskew文件夹
-            deskew_folder = os.path.join(self.image_folder, "Deskew")
-            if not os.path.exists(deskew_folder):
-                os.makedirs(deskew_folder)
-            
-            # Deskew文件夹中的文件路径
-            deskew_file_path = os.path.join(deskew_folder, filename)
-            
             try:
-                # 如果Deskew文件夹中还没有该文件的副本，则创建副本
-                if not os.path.exists(deskew_file_path):
-                    # 复制原文件到Deskew文件夹
-                    import shutil
-                    shutil.copy2(original_file_path, deskew_file_path)
-                    print(f"Created copy in Deskew folder: {filename}")
+                # 该文件还在后台保存时等待写完，避免读到旧文件或半写入的文件；
+                # 随后处理保存结果，JPEG 保存为 PNG 后按新文件名加载
+                self.save_queue.wait(filename)
+                self.drain_finished_saves()
+                filename = self.image_files[self.current_image_index]
+                original_file_path = os.path.join(self.image_folder, filename)
                 
-                # 始终从Deskew文件夹加载图片
-                self.original_image = Image.open(deskew_file_path)
-                self.image = self.original_image.copy()
+                # 写时复制：Deskew文件夹中没有输出时直接读取原图；已预解码时直接取缓存
+                with timing_image(filename):
+                    decoded = self.prefetcher.load(self.image_folder, filename)
+                self.original_image = decoded.image
+                # 图片不会被原地修改，未旋转时直接共用原图，超大图片不再多占一份内存
+                self.image = self.original_image
+                self.cancel_pending_rotation()
                 self.rotation_angle = 0
+                self.full_render_pending = False
+                self.preview_source = decoded.proxy
+                self.preview_factor = decoded.proxy_factor
+                self.preview_image = None
                 
                 # 重置尺寸锁定管理器的原始尺寸
                 if self.size_lock_manager.lock_size:
                     self.size_lock_manager.original_size = self.original_image.size
                 
+                # 保存失败的旋转重新应用，修改标记仍在，切换图片时会再次保存
+                failed_angle = self.failed_rotations.pop(filename, None)
+                if failed_angle:
+                    self.update_rotation(failed_angle)
+                
                 self.display_manager.apply_zoom_mode()
                 self.display_image()
                 self.update_status()
+                self.prefetch_neighbours()
                 
             except Exception as e:
                 error_msg = self._get_image_error_message(e, original_file_path)
                 messagebox.showerror("错误", error_msg)
 
+    def prefetch_neighbours(self):
+        """按翻页方向预解码后面 PREFETCH_PAGES 张，再预解码反方向的同样张数（列表首尾相接）
+        
+        仍在后台保存的图片不预解码，避免读到旧文件或半写入的文件。
+        """
+        count = len(self.image_files)
+        order = []
+        for direction in (self.navigation_direction, -self.navigation_direction):
+            for step in range(1, PREFETCH_PAGES + 1):
+                index = (self.current_image_index + direction * step) % count
+                if index != self.current_image_index and index not in order:
+                    order.append(index)
+        self.prefetcher.request([
+            (self.image_folder, self.image_files[index]) for index in order
+            if not self.save_queue.is_pending(self.image_files[index])
+        ])
+
     def _get_image_error_message(self, error, file_path):
         """获取图片错误信息"""
         base_msg = self._("image_error", os.path.basename(file_path), str(error))
@@ -1756,7 +1725,7 @@ class AdvancedImageRotator:
         self.canvas.delete("all")
 
         if self.image:
-            img_width, img_height = self.image.size
+            img_width, img_height = self.image_size
             
             # 计算显示尺寸
             display_width, display_height, scale, base_scale = \
@@ -1764,20 +1733,31 @@ class AdvancedImageRotator:
                     canvas_width, canvas_height, img_width, img_height
                 )
             
-            # 如果有透明通道，创建带棋盘格背景的图片
-            if self.has_alpha_channel(self.image):
-                display_image = self._create_checkerboard_image(self.image, display_width, display_height)
-            else:
-                # 非透明图片正常处理
-                display_image = self._resize_image(self.image, display_width, display_height, img_width, img_height)
-            
-            self.photo = ImageTk.PhotoImage(display_image)
-            
             # 计算图片位置
             img_x = canvas_width // 2 + self.display_manager.pan_x
             img_y = canvas_height // 2 + self.display_manager.pan_y
-            
-            self.canvas.create_image(img_x, img_y, image=self.photo, anchor=tk.CENTER)
+            offset_x = img_x - display_width // 2
+            offset_y = img_y - display_height // 2
+            
+            # 只渲染落在画布内的部分，耗时和内存与缩放倍数无关
+            left, top = max(0, offset_x), max(0, offset_y)
+            right = min(canvas_width, offset_x + display_width)
+            bottom = min(canvas_height, offset_y + display_height)
+            if right > left and bottom > top:
+                # 代理图的分辨率足够时直接显示代理图，否则生成全分辨率结果
+                source = self.display_source(scale)
+                region = (left - offset_x, top - offset_y, right - offset_x, bottom - offset_y)
+                pyramid = self._display_pyramid_for(source)
+                if pyramid is not None:
+                    viewport = pyramid.render(region, display_width, display_height,
+                                              self.display_manager.get_resample_method)
+                else:
+                    viewport = self._render_viewport(source, region, display_width, display_height)
+                
+                # 如果有透明通道，叠加到棋盘格背景上
+                if self.has_alpha_channel(source):
+                    viewport = self._create_checkerboard_image(viewport, left, top, canvas_width, canvas_height)
+                self._show_viewport(viewport, left, top)
             
             # 更新显示信息
             self.display_manager.update_display_info(
@@ -1796,45 +1776,73 @@ class AdvancedImageRotator:
         if self.crosshair_manager.is_visible and self.crosshair_manager.show_crosshair:
             self.crosshair_manager.draw_crosshair()
 
-    def _create_checkerboard_image(self, image, display_width, display_height):
-        """为透明图片创建带棋盘格背景的显示图片"""
-        # 创建棋盘格背景
-        cell_size = 20
-        checkerboard = Image.new('RGB', (display_width, display_height), "#E0E0E0")
-        draw = ImageDraw.Draw(checkerboard)
-        
-        # 绘制棋盘格
-        for y in range(0, display_height, cell_size):
-            for x in range(0, display_width, cell_size):
-                if (x // cell_size + y // cell_size) % 2 == 0:
-                    color = "#666666"  # 浅灰色
-                else:
-                    color = "#B8B8B8"  # 深灰色
-                draw.rectangle([x, y, x+cell_size, y+cell_size], fill=color)
-        
-        # 调整原图大小
-        resized_image = image.resize((display_width, display_height), Image.Resampling.LANCZOS)
-        
-        # 将透明图片叠加在棋盘格上
-        if resized_image.mode == 'RGBA':
-            checkerboard.paste(resized_image, (0, 0), resized_image)
+    def _display_pyramid_for(self, source):
+        """显示来源图的金字塔，来源图变化（切换图片、旋转、生成全分辨率结果）时重新生成
+        
+        调色板、1 位等不能逐级缩小的模式返回 None，直接从来源图渲染。
+        """
+        if source.mode not in DisplayPyramid.MODES:
+            return None
+        if self.display_pyramid is None or self.display_pyramid.source is not source:
+            if self.display_pyramid is not None:
+                self.display_pyramid.cancel()
+            self.display_pyramid = DisplayPyramid(source)
+            self.display_pyramid.start()
+        return self.display_pyramid
+
+    def _render_viewport(self, source, region, display_width, display_height):
+        """把显示区域 region（相对整幅显示图的 left, top, right, bottom）对应的来源图部分缩放到区域大小
+        
+        Image.resize 的 box 参数只读取并重采样该区域，放大时不生成整幅的放大图。
+        """
+        source_width, source_height = source.size
+        scale_x = source_width / display_width
+        scale_y = source_height / display_height
+        left, top, right, bottom = region
+        box = (left * scale_x, top * scale_y, right * scale_x, bottom * scale_y)
+        size = (right - left, bottom - top)
+        
+        if (display_width, display_height) == source.size:
+            return source.crop(region)
+        resample_method = self.display_manager.get_resample_method(
+            source_width * source_height, display_width * display_height)
+        return source.resize(size, resample_method, box=box)
+
+    def _show_viewport(self, image, x, y):
+        """在画布 (x, y) 处显示可见部分；尺寸和模式不变时复用同一个 PhotoImage，只替换像素"""
+        if self.photo is not None and self._photo_key == (image.size, image.mode):
+            self.photo.paste(image)
         else:
-            checkerboard.paste(resized_image, (0, 0))
-        
+            self.photo = ImageTk.PhotoImage(image)
+            self._photo_key = (image.size, image.mode)
+        self.canvas.create_image(x, y, image=self.photo, anchor=tk.NW)
+
+    def _checkerboard_for(self, canvas_width, canvas_height):
+        """画布大小的棋盘格背景，画布尺寸不变时复用（把 2×2 个格子的图案平铺到画布大小）"""
+        size = (canvas_width, canvas_height)
+        if self._checkerboard is None or self._checkerboard.size != size:
+            cell = CHECKERBOARD_CELL_SIZE
+            pattern = np.empty((2 * cell, 2 * cell, 3), dtype=np.uint8)
+            pattern[:] = CHECKERBOARD_LIGHT
+            pattern[:cell, :cell] = CHECKERBOARD_DARK
+            pattern[cell:, cell:] = CHECKERBOARD_DARK
+            tiled = np.tile(pattern, (-(-canvas_height // (2 * cell)), -(-canvas_width // (2 * cell)), 1))
+            self._checkerboard = Image.fromarray(np.ascontiguousarray(tiled[:canvas_height, :canvas_width]), 'RGB')
+        return self._checkerboard
+
+    def _create_checkerboard_image(self, image, x, y, canvas_width, canvas_height):
+        """把透明图片（已缩放到可见区域大小、位于画布 (x, y) 处）叠加到棋盘格背景上
+        
+        背景从缓存的画布大小棋盘格中截取同一位置，平移时格子相对画布保持不动。
+        """
+        checkerboard = self._checkerboard_for(canvas_width, canvas_height).crop(
+            (x, y, x + image.width, y + image.height))
+        if image.mode != 'RGBA':
+            # LA 和带透明色的调色板图片按透明度叠加
+            image = image.convert('RGBA')
+        checkerboard.paste(image, (0, 0), image)
         return checkerboard
 
-    def _resize_image(self, image, display_width, display_height, original_width, original_height):
-        """调整图片大小"""
-        scale = display_width / original_width
-        
-        if scale != 1.0:
-            original_pixels = original_width * original_height
-            display_pixels = display_width * display_height
-            resample_method = self.display_manager.get_resample_method(original_pixels, display_pixels)
-            return image.resize((display_width, display_height), resample_method)
-        else:
-            return image.copy()
-
     def show_no_image_prompt(self, canvas_width, canvas_height):
         """在没有图片时显示提示信息""" 
         # 计算居中位置
@@ -1901,7 +1909,7 @@ class AdvancedImageRotator:
             img_y = rel_y / scale
             
             # 确保坐标在图像范围内
-            img_width, img_height = self.image.size
+            img_width, img_height = self.image_size
             img_x = max(0, min(img_width - 1, img_x))
             img_y = max(0, min(img_height - 1, img_y))
             
@@ -1913,7 +1921,7 @@ class AdvancedImageRotator:
         """检查点是否在图片范围内"""
         if not self.image:
             return False
-        img_width, img_height = self.image.size
+        img_width, img_height = self.image_size
         return 0 <= x < img_width and 0 <= y < img_height
 
     def _handle_image_click(self, x, y):
@@ -2033,23 +2041,8 @@ class AdvancedImageRotator:
     def rotate_image_to(self, angle):
         """旋转图片到指定角度"""
         if self.original_image:
-            # 检查是否有透明通道
-            if self.has_alpha_channel(self.original_image):
-                # 透明图片：使用透明背景旋转
-                fillcolor = None
-            else:
-                # 非透明图片：使用设置的背景色
-                fillcolor = self.bg_color
-                
-            rotated_image = self.original_image.rotate(
-                angle, 
-                expand=True, 
-                resample=Image.BICUBIC,
-                fillcolor=fillcolor
-            )
-            
-            self.image = rotated_image
-            self.rotation_angle = angle
+            self.cancel_pending_rotation()
+            self.update_rotation(angle)
             self.display_image()
             self.update_status()
             
@@ -2059,32 +2052,90 @@ class AdvancedImageRotator:
     def rotate_by_angle(self, angle):
         """按指定角度旋转图片"""
         if self.original_image:
-            total_angle = self.rotation_angle + angle
-            
-            # 检查是否有透明通道
-            if self.has_alpha_channel(self.original_image):
-                # 透明图片：使用透明背景旋转
-                fillcolor = None  # 或者 (255, 255, 255, 0)
-            else:
-                # 非透明图片：使用设置的背景色
-                fillcolor = self.bg_color
-            
-            rotated_image = self.original_image.rotate(
-                total_angle, 
-                expand=True, 
-                resample=Image.BICUBIC,
-                fillcolor=fillcolor
-            )
-            
-            self.image = rotated_image
-            self.rotation_angle = total_angle
-            self.point_manager.reset_points()
-            self.display_image()
-            self.update_status()
+            # 在尚未渲染的目标角度上累加，按键期间立即显示目标角度
+            base_angle = self.target_angle if self._rotation_timer else self.rotation_angle
+            self.target_angle = base_angle + angle
+            self.angle_label.config(text=self._("current_angle", self.target_angle))
             self._mark_image_modified()
             
             # 旋转后标记需要清除输入
             self.angle_input_manager.should_clear_input = True
+            
+            if self._rotation_timer is None:
+                self._rotation_timer = self.root.after(ROTATION_FRAME_MS, self._render_pending_rotation)
+
+    def _render_pending_rotation(self):
+        """渲染累加后的目标角度（渲染期间到达的按键会合并到下一帧）"""
+        self._rotation_timer = None
+        self.update_rotation(self.target_angle)
+        self.point_manager.reset_points()
+        self.display_image()
+        self.update_status()
+
+    def flush_pending_rotation(self):
+        """立即渲染尚未渲染的旋转（保存、检测等需要当前角度的操作之前调用）"""
+        if self._rotation_timer is not None:
+            self.root.after_cancel(self._rotation_timer)
+            self._render_pending_rotation()
+
+    def cancel_pending_rotation(self):
+        """丢弃尚未渲染的旋转（切换图片、重置或设置绝对角度时调用）"""
+        if self._rotation_timer is not None:
+            self.root.after_cancel(self._rotation_timer)
+            self._rotation_timer = None
+
+    def render_rotation(self, angle):
+        """从原图生成旋转结果，尺寸锁定时一次变换直接输出原始尺寸"""
+        with timing_image(self.current_filename()):
+            if self.size_lock_manager.lock_size and self.size_lock_manager.original_size:
+                return rotate_to_size(self.original_image, angle, self.size_lock_manager.original_size,
+                                      self.bg_color, self.rotation_backend, self.resample)
+            return rotate_image(self.original_image, angle, self.bg_color, self.rotation_backend, self.resample)
+
+    def update_rotation(self, angle):
+        """设置旋转角度：有代理图时只旋转代理图，全分辨率结果延迟到 ensure_full_image"""
+        self.rotation_angle = angle
+        if self.preview_source is None:
+            self.image = self.render_rotation(angle)
+            self.full_render_pending = False
+            return
+        
+        with timing_image(self.current_filename()):
+            if self.size_lock_manager.lock_size and self.size_lock_manager.original_size:
+                self.preview_image = rotate_to_size(self.preview_source, angle, self.preview_source.size,
+                                                    self.bg_color, self.rotation_backend, self.resample)
+                self.pending_size = self.size_lock_manager.original_size
+            else:
+                self.preview_image = rotate_image(self.preview_source, angle, self.bg_color,
+                                                  self.rotation_backend, self.resample)
+                self.pending_size = expanded_size(self.original_image.size, angle)
+        self.full_render_pending = True
+
+    def ensure_full_image(self):
+        """返回全分辨率旋转结果，尚未生成时立即生成"""
+        if self.full_render_pending:
+            self.image = self.render_rotation(self.rotation_angle)
+            self.full_render_pending = False
+        return self.image
+
+    @property
+    def image_size(self):
+        """当前旋转结果的全分辨率尺寸（结果尚未生成时也可用于坐标换算）"""
+        if self.full_render_pending:
+            return self.pending_size
+        return self.image.size
+
+    def display_source(self, scale):
+        """按显示比例选择显示来源：代理图像素足够时用代理图，放大后需要更多细节时生成全分辨率结果"""
+        if self.full_render_pending and scale * self.preview_factor <= 1.0:
+            return self.preview_image
+        return self.ensure_full_image()
+
+    def current_filename(self):
+        """当前图片文件名，没有图片时返回 None"""
+        if 0 <= self.current_image_index < len(self.image_files):
+            return self.image_files[self.current_image_index]
+        return None
 
     def _mark_image_modified(self):
         """标记图片已被修改"""
@@ -2097,6 +2148,8 @@ class AdvancedImageRotator:
         if 0 <= self.current_image_index < len(self.image_files):
             filename = self.image_files[self.current_image_index]
             modified_indicator = self._("modified") if self.image_modified.get(filename, False) else ""
+            if filename in self.save_state:
+                modified_indicator += self._("save_" + self.save_state[filename])
             display_filename = self.adaptive_filename_display(filename)
             
             self.status_label.config(
@@ -2118,7 +2171,7 @@ class AdvancedImageRotator:
         
         # 显示尺寸信息
         if self.image:
-            width, height = self.image.size
+            width, height = self.image_size
             lock_status = self._("size_locked") if self.size_lock_manager.lock_size else ""
             self.size_label.config(text=self._("size", f"{width}×{height}{lock_status}"))
         else:
@@ -2128,7 +2181,11 @@ class AdvancedImageRotator:
         method_names = {
             "standard": self._("hough_standard"),
             "probabilistic": self._("hough_probabilistic"), 
-            "optimized": self._("hough_optimized")
+            "optimized": self._("hough_optimized"),
+            "projection": self._("hough_projection"),
+            "fourier": self._("hough_fourier"),
+            "tiles": self._("hough_tiles"),
+            "cascade": self._("hough_cascade")
         }
         method_name = method_names.get(self.auto_deskewer.hough_method, self._("hough_optimized"))
         self.hough_method_label.config(text=self._("hough_method", method_name))
@@ -2177,8 +2234,10 @@ class AdvancedImageRotator:
     def reset_image(self):
         """重置当前图片到原始状态"""
         if self.original_image:
-            self.image = self.original_image.copy()
+            self.cancel_pending_rotation()
+            self.image = self.original_image
             self.rotation_angle = 0
+            self.full_render_pending = False
             self.point_manager.reset_points()
             self.display_manager.apply_zoom_mode()
             self.display_image()
@@ -2188,6 +2247,7 @@ class AdvancedImageRotator:
             if 0 <= self.current_image_index < len(self.image_files):
                 filename = self.image_files[self.current_image_index]
                 self.image_modified[filename] = False
+                self.failed_rotations.pop(filename, None)
 
     def previous_image(self):
         """切换到上一张图片"""
@@ -2198,6 +2258,7 @@ class AdvancedImageRotator:
                     return  # 用户选择取消
             
             self.save_current_image_if_modified()
+            self.navigation_direction = -1
             
             if self.current_image_index > 0:
                 self.current_image_index -= 1
@@ -2217,6 +2278,7 @@ class AdvancedImageRotator:
                     return  # 用户选择取消
             
             self.save_current_image_if_modified()
+            self.navigation_direction = 1
             
             if self.current_image_index < len(self.image_files) - 1:
                 self.current_image_index += 1
@@ -2229,86 +2291,117 @@ class AdvancedImageRotator:
 
     def save_current_image_if_modified(self):
         """保存当前图片到Deskew文件夹"""
+        self.flush_pending_rotation()
         if self.image and 0 <= self.current_image_index < len(self.image_files):
             filename = self.image_files[self.current_image_index]
+            deskew_folder = os.path.join(self.image_folder, DESKEW_FOLDER_NAME)
+            output_path = os.path.join(deskew_folder, filename)
             if self.image_modified.get(filename, False):
-                try:
-                    deskew_folder = os.path.join(self.image_folder, "Deskew")
-                    original_file_path = os.path.join(self.image_folder, filename)
-                    file_path = os.path.join(deskew_folder, filename)
-                    
-                    # 如果启用了尺寸锁定，先裁切图片
-                    save_image = self.image
-                    if self.size_lock_manager.lock_size:
-                        save_image = self.size_lock_manager.crop_to_original_size(self.image)
-                    
-                    # 获取文件扩展名
-                    file_ext = os.path.splitext(filename)[1].lower()
-                    
-                    # 智能保存策略
-                    if file_ext in ['.jpg', '.jpeg']:
-                        # JPEG转为PNG避免质量损失
-                        new_filename = os.path.splitext(filename)[0] + '.png'
-                        file_path = os.path.join(deskew_folder, new_filename)
-                        save_image.save(file_path, optimize=True)
-                        print(f"JPEG转换为PNG保存: {filename} -> {new_filename}")
-                        
-                    elif file_ext == '.webp':
-                        # WebP使用无损模式保存
-                        save_image.save(file_path, lossless=True)
-                        
-                    elif file_ext == '.gif':
-                        # GIF保持原格式，但优化调色板
-                        save_image.save(file_path, optimize=True)
-                        
-                    elif file_ext in ['.tiff', '.tif']:
-                        # TIFF使用无损压缩
-                        save_image.save(file_path, compression='tiff_deflate')
-                        
-                    elif file_ext == '.png':
-                        # PNG优化压缩
-                        save_image.save(file_path, optimize=True)
-                        
-                    else:
-                        # 其他格式默认保存
-                        save_image.save(file_path)
-                    
-                    self.image_modified[filename] = False
-                    print(f"Saved to Deskew folder: {filename}")
-                    
-                    # 更新文件列表（如果格式改变）
-                    if file_ext in ['.jpg', '.jpeg'] and new_filename:
-                        self.image_files[self.current_image_index] = new_filename
-                    
-                    # 强制重新加载所有缩略图
-                    self.reload_all_thumbnails()
-                    
-                except Exception as e:
-                    print(f"Save failed: {str(e)}")
-
-    def reload_all_thumbnails(self):
-        """重新加载所有缩略图"""
-        # 清除缓存
-        self.thumbnail_manager.cache = {}
-        
-        # 重新加载所有缩略图
-        for i, filename in enumerate(self.image_files):
-            file_path = os.path.join(self.image_folder, filename)
-            photo = self._load_thumbnail_image(file_path)
-            
-            if photo and i < len(self.thumbnail_manager.buttons):
-                btn = self.thumbnail_manager.buttons[i]
-                btn.config(
-                    image=photo, 
-                    text="", 
-                    width=photo.width(), 
-                    height=photo.height()
-                )
-                # 保存引用
-                if i < len(self.thumbnail_manager.images):
-                    self.thumbnail_manager.images[i] = photo
-                else:
-                    self.thumbnail_manager.images.append(photo)
+                os.makedirs(deskew_folder, exist_ok=True)
+                
+                # 提交时固定保存参数；全分辨率结果尚未生成时由写入线程从原图生成
+                rendered = None if self.full_render_pending else self.image
+                original_image = self.original_image
+                angle = self.rotation_angle
+                bg_color = self.bg_color
+                backend, resample = self.rotation_backend, self.resample
+                encoder_preset = self.encoder_preset
+                lock_size = self.size_lock_manager.lock_size and self.size_lock_manager.original_size
+                original_size = self.size_lock_manager.original_size
+                
+                strips = rendered is None and needs_strip_processing(original_image)
+                
+                def save_job():
+                    with timing_image(filename):
+                        save_image = rendered
+                        if strips:
+                            # 超大图片分条旋转并逐条写入，不生成整幅旋转结果
+                            size = original_size if lock_size else expanded_size(original_image.size, angle)
+                            saved = save_deskewed_strips(original_image, angle, size, bg_color, deskew_folder,
+                                                         filename, encoder_preset, resample)
+                            if saved is not None:
+                                return saved
+                        if save_image is None:
+                            if lock_size:
+                                save_image = rotate_to_size(original_image, angle, original_size,
+                                                            bg_color, backend, resample)
+                            else:
+                                save_image = rotate_image(original_image, angle, bg_color, backend, resample)
+                        elif lock_size and save_image.size != original_size:
+                            # 如果启用了尺寸锁定，先裁切图片
+                            save_image = crop_to_size(save_image, original_size, bg_color)
+                        return save_deskewed_image(save_image, deskew_folder, filename, encoder_preset)
+                
+                # 保存中不再重复提交；文件列表改名（JPEG 保存为 PNG）和清除修改标记在保存成功后进行，
+                # 保存失败时恢复修改标记，图片仍按原文件名加载
+                self.image_modified[filename] = False
+                self.pending_saves[filename] = angle
+                self.failed_rotations.pop(filename, None)
+                
+                # 排队内存按原图和旋转结果估算，分条保存时旋转结果不超过分条工作内存
+                self.save_state[filename] = "pending"
+                working_bytes = STRIP_MEMORY_BUDGET if strips else image_nbytes(original_image)
+                self.save_queue.submit(filename, image_nbytes(original_image) + working_bytes, save_job)
+                self.update_thumbnails_selection()
+            elif self.unchanged_output != "none" and not os.path.exists(output_path):
+                # 未修改的图片按设置复制、硬链接或克隆到Deskew文件夹，同样在写入线程中完成
+                source_path = os.path.join(self.image_folder, filename)
+                mode = self.unchanged_output
+                
+                def link_job():
+                    os.makedirs(deskew_folder, exist_ok=True)
+                    write_unchanged_output(source_path, output_path, mode)
+                    return filename
+                
+                self.save_queue.submit(filename, 0, link_job)
+
+    def _poll_finished_saves(self):
+        """定时处理后台保存结果（主线程）"""
+        self.drain_finished_saves()
+        self.root.after(SAVE_POLL_MS, self._poll_finished_saves)
+
+    def drain_finished_saves(self):
+        """处理队列中所有已完成的保存（主线程）"""
+        while True:
+            try:
+                filename, saved_filename, error = self.finished_saves.get_nowait()
+            except queue.Empty:
+                return
+            self._on_save_finished(filename, saved_filename, error)
+
+    def _on_save_finished(self, filename, saved_filename, error):
+        """后台保存完成（主线程）：更新文件列表、修改标记、保存状态和缩略图"""
+        if self.save_queue.is_pending(filename):
+            # 同一文件还有更新的保存在排队
+            return
+        # 不在 pending_saves 中的是未修改图片的复制任务，或切换文件夹前提交的保存
+        is_rotation_save = filename in self.pending_saves
+        angle = self.pending_saves.pop(filename, None)
+        if error is None:
+            self.save_state.pop(filename, None)
+            # 更新文件列表（如果格式改变），修改标记随文件名转移
+            if is_rotation_save and saved_filename != filename and filename in self.image_files:
+                self.image_files[self.image_files.index(filename)] = saved_filename
+                self.image_modified[saved_filename] = self.image_modified.pop(filename, False)
+                filename = saved_filename
+            # 只重新生成已保存文件的缩略图
+            if filename in self.image_files:
+                self.update_thumbnail_at(self.image_files.index(filename))
+        else:
+            self.save_state[filename] = "failed"
+            if is_rotation_save:
+                # 恢复修改标记以便重新保存，并记下角度：重新加载该图片时恢复旋转
+                self.image_modified[filename] = True
+                self.failed_rotations[filename] = angle
+            self.status_label.config(text=self._("save_failed_status", filename, str(error)))
+        self.update_thumbnails_selection()
+        if filename == self.current_filename():
+            self.update_status()
+
+    def on_close(self):
+        """关闭窗口：先写完后台保存队列"""
+        self.save_queue.wait()
+        self.root.destroy()
 
     def on_key_press(self, event):
         """键盘事件处理"""
@@ -2354,17 +2447,56 @@ class AdvancedImageRotator:
             self._cycle_hough_method()
             return
         
+        # 旋转引擎切换快捷键
+        if key == 'k':
+            self._cycle_rotation_engine()
+            return
+        
+        # 输出编码预设切换快捷键
+        if key == 'j':
+            self._cycle_encoder_preset()
+            return
+        
+        # 未修改图片输出方式切换快捷键
+        if key == 'u':
+            self._cycle_unchanged_output()
+            return
+        
         # 常规快捷键处理
         self._handle_shortcuts(key)
 
     def _cycle_hough_method(self):
         """循环切换霍夫变换方法"""
-        methods = ["standard", "probabilistic", "optimized"]
-        current_index = methods.index(self.auto_deskewer.hough_method)
-        next_index = (current_index + 1) % len(methods)
-        self.auto_deskewer.set_hough_method(methods[next_index])
+        current_index = HOUGH_METHODS.index(self.auto_deskewer.hough_method)
+        next_index = (current_index + 1) % len(HOUGH_METHODS)
+        self.auto_deskewer.set_hough_method(HOUGH_METHODS[next_index])
         self.update_status()
 
+    def _cycle_rotation_engine(self):
+        """循环切换旋转引擎：OpenCV 双三次 → OpenCV Lanczos → PIL 双三次"""
+        engines = [("opencv", "bicubic"), ("opencv", "lanczos"), ("pil", "bicubic")]
+        current = (self.rotation_backend, self.resample)
+        next_index = (engines.index(current) + 1) % len(engines) if current in engines else 0
+        self.rotation_backend, self.resample = engines[next_index]
+        self.flush_pending_rotation()
+        if self.original_image and self.rotation_angle:
+            self.update_rotation(self.rotation_angle)
+            self.display_image()
+        self.status_label.config(text=self._("rotation_engine", self.rotation_backend, self.resample))
+
+    def _cycle_encoder_preset(self):
+        """循环切换输出编码预设"""
+        presets = list(ENCODER_PRESETS)
+        next_index = (presets.index(self.encoder_preset) + 1) % len(presets)
+        self.encoder_preset = presets[next_index]
+        self.status_label.config(text=self._("encoder_preset", self.encoder_preset))
+
+    def _cycle_unchanged_output(self):
+        """循环切换未修改图片写入Deskew文件夹的方式（none 为写时复制，不写入）"""
+        modes = UNCHANGED_OUTPUT_MODES
+        self.unchanged_output = modes[(modes.index(self.unchanged_output) + 1) % len(modes)]
+        self.status_label.config(text=self._("unchanged_output", self.unchanged_output))
+
     def _handle_shortcuts(self, key):
         """处理快捷键"""
         shortcut_actions = {
@@ -2527,7 +2659,7 @@ class AdvancedImageRotator:
             # 预计算新的显示参数
             canvas_width = self.canvas.winfo_width()
             canvas_height = self.canvas.winfo_height()
-            img_width, img_height = self.image.size
+            img_width, img_height = self.image_size
             
             # 计算新的显示尺寸和缩放比例
             if self.display_manager.zoom_mode == "height":
@@ -2593,7 +2725,7 @@ class AdvancedImageRotator:
             # 预计算新的显示参数
             canvas_width = self.canvas.winfo_width()
             canvas_height = self.canvas.winfo_height()
-            img_width, img_height = self.image.size
+            img_width, img_height = self.image_size
             
             # 计算新的显示尺寸和缩放比例
             if self.display_manager.zoom_mode == "height":
@@ -2655,7 +2787,7 @@ class AdvancedImageRotator:
             display_info = self.display_manager.display_info
             
             # 获取当前图像尺寸
-            img_width, img_height = self.image.size
+            img_width, img_height = self.image_size
             
             # 计算鼠标在图像上的坐标
             if display_info['scale'] > 0:
@@ -2807,6 +2939,10 @@ class AdvancedImageRotator:
                 elif response:  # 用户点击是
                     self.save_current_image_if_modified()
         
+        # 写完后台保存队列中的所有图片
+        self.save_queue.wait()
+        self.drain_finished_saves()
+        
         # 重置所有状态
         self._reset_application_state()
         
@@ -2822,8 +2958,17 @@ class AdvancedImageRotator:
         self.current_image_index = -1
         self.image = None
         self.photo = None
+        self.cancel_pending_rotation()
         self.original_image = None
         self.rotation_angle = 0
+        self.preview_source = None
+        self.preview_image = None
+        self.full_render_pending = False
+        if self.display_pyramid is not None:
+            self.display_pyramid.cancel()
+            self.display_pyramid = None
+        self.prefetcher.cancel()
+        self.prefetcher.cache.clear()
         
         # 重置各个管理器状态
         self.display_manager.zoom_level = 1.0
@@ -2832,11 +2977,16 @@ class AdvancedImageRotator:
         self.crosshair_manager.set_visibility(False)
         self.thumbnail_manager.cache = {}
         self.image_modified = {}
+        self.save_state = {}
+        self.pending_saves = {}
+        self.failed_rotations = {}
         self.point_manager.reset_points()
         self.size_lock_manager.lock_size = False
         self.size_lock_manager.original_size = None
         self.auto_deskewer.is_batch_deskewing = False
         self.auto_deskewer.stop_batch_deskewion = True
+        if self.auto_deskewer.batch_pipeline:
+            self.auto_deskewer.batch_pipeline.stop()
 
     def _reset_ui(self):
         """重置用户界面"""
@@ -2928,9 +3078,13 @@ class AdvancedImageRotator:
 
     def has_alpha_channel(self, image):
         """检查图片是否有透明通道"""
-        return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        return has_alpha_channel(image)
 
 def main():
+    # 设置环境变量 PICDOC_STAGE_TIMINGS=文件路径 时记录各处理阶段耗时，退出时导出（.csv 或 JSON lines）
+    timings_path = os.environ.get("PICDOC_STAGE_TIMINGS")
+    stage_timings = enable_stage_timings() if timings_path else None
+    
     # 根据是否支持拖拽创建不同的窗口
     if HAS_DND:
         root = TkinterDnD.Tk()
@@ -2939,6 +3093,13 @@ def main():
         
     app = AdvancedImageRotator(root)
     root.mainloop()
+    app.save_queue.wait()
+    
+    if stage_timings is not None:
+        stage_timings.write(timings_path)
+        print(f"Stage timings written to {timings_path}")
 
 if __name__ == "__main__":
+    # 打包为可执行文件时，批量纠偏的工作进程从这里进入，不能再打开界面
+    multiprocessing.freeze_support()
     main()
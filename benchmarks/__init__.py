@@ -0,0 +1 @@
+"""性能与精度基准测试 - 在仓库根目录以模块方式运行，例如 python -m benchmarks.bench_detection"""
@@ -0,0 +1,246 @@
+"""倾斜检测基准：在已知角度的合成页面上运行每种检测方法，输出误差分位数、吞吐量和峰值内存（JSON）
+
+用法示例：
+    python -m benchmarks.bench_detection -o bench.json
+    python -m benchmarks.bench_detection --methods optimized,projection --sizes 1240x1754 --baseline bench.json
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import PIL
+
+from deskew_core import HOUGH_METHODS, DeskewDetector
+from benchmarks.synthetic import LAYOUTS, render_page
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = "1240x1754,2480x3508"  # A4 150dpi / 300dpi
+DEFAULT_ANGLES = "-12,-5,-2,-0.7,0,0.4,1.5,3,8"
+DEFAULT_NOISE = "0,0.02"
+PERCENTILES = [50, 90, 95, 99]
+
+
+def parse_list(value, convert=str):
+    return [convert(part) for part in value.split(',') if part.strip()]
+
+
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB），平台不支持时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 计，macOS 以字节计
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def error_summary(errors):
+    """绝对误差的分位数统计"""
+    if not errors:
+        return None
+    errors = np.asarray(errors)
+    summary = {f"p{p}": round(float(np.percentile(errors, p)), 4) for p in PERCENTILES}
+    summary["max"] = round(float(errors.max()), 4)
+    summary["mean"] = round(float(errors.mean()), 4)
+    return summary
+
+
+def run_method(method, cases):
+    """在独立进程中运行一种检测方法：计时一遍，再对每种尺寸的一张页面测量分配峰值"""
+    detector = DeskewDetector(method)
+    quiet = io.StringIO()
+    pages = []
+    total_seconds = 0.0
+
+    for case in cases:
+        page = render_page(case['width'], case['height'], case['skew'], case['layout'], case['noise'], case['seed'])
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(quiet):
+            result = detector.analyze_image(page)
+        seconds = time.perf_counter() - start
+        quiet.seek(0)
+        quiet.truncate()
+        total_seconds += seconds
+        pages.append(dict(case,
+                          angle=round(result.angle, 4),
+                          error=round(abs(result.angle + case['skew']), 4),
+                          confidence=round(result.confidence, 4),
+                          fallback=result.fallback,
+                          detected_by=result.method,
+                          seconds=round(seconds, 5)))
+
+    # 分配峰值（tracemalloc 会拖慢计算，单独测量）
+    traced = {}
+    for case in cases:
+        size = f"{case['width']}x{case['height']}"
+        if size in traced:
+            continue
+        page = render_page(case['width'], case['height'], case['skew'], case['layout'], case['noise'], case['seed'])
+        tracemalloc.start()
+        with contextlib.redirect_stdout(quiet):
+            detector.analyze_image(page)
+        traced[size] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        tracemalloc.stop()
+
+    return {
+        'method': method,
+        'pages': pages,
+        'seconds': total_seconds,
+        'peak_traced_mb': traced,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def summarize(run):
+    """汇总一种方法的结果；fallback（未检测到直线）的页面单独计数，不计入误差"""
+    pages = run['pages']
+    detected = [page for page in pages if not page['fallback']]
+    summary = {
+        'method': run['method'],
+        'pages': len(pages),
+        'fallback_pages': len(pages) - len(detected),
+        'error_deg': error_summary([page['error'] for page in detected]),
+        'pages_per_second': round(len(pages) / run['seconds'], 3) if run['seconds'] > 0 else None,
+        'seconds': round(run['seconds'], 3),
+        'peak_traced_mb': run['peak_traced_mb'],
+        'peak_rss_mb': run['peak_rss_mb'],
+        'by_layout': {},
+        'by_size': {}
+    }
+    for key, field in (('by_layout', 'layout'), ('by_size', None)):
+        groups = {}
+        for page in detected:
+            group = page[field] if field else f"{page['width']}x{page['height']}"
+            groups.setdefault(group, []).append(page['error'])
+        summary[key] = {group: error_summary(errors) for group, errors in sorted(groups.items())}
+    return summary
+
+
+def compare_with_baseline(report, baseline, max_error_increase, max_slowdown):
+    """与基线报告比较，返回回归描述列表"""
+    regressions = []
+    previous = {result['method']: result for result in baseline.get('results', [])}
+    for result in report['results']:
+        old = previous.get(result['method'])
+        if not old:
+            continue
+        if result['error_deg'] and old.get('error_deg'):
+            increase = result['error_deg']['p95'] - old['error_deg']['p95']
+            if increase > max_error_increase:
+                regressions.append(f"{result['method']}: p95 error {old['error_deg']['p95']}° -> "
+                                   f"{result['error_deg']['p95']}°")
+        if result['pages_per_second'] and old.get('pages_per_second'):
+            if result['pages_per_second'] < old['pages_per_second'] * (1 - max_slowdown):
+                regressions.append(f"{result['method']}: {old['pages_per_second']} -> "
+                                   f"{result['pages_per_second']} pages/s")
+        if result['fallback_pages'] > old.get('fallback_pages', 0):
+            regressions.append(f"{result['method']}: fallback pages {old.get('fallback_pages', 0)} -> "
+                               f"{result['fallback_pages']}")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="bench_detection",
+        description="Skew detection accuracy/speed benchmark on synthetic pages (JSON output)."
+    )
+    parser.add_argument("--methods", default=",".join(HOUGH_METHODS),
+                        help="comma-separated detection methods (default: all)")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated WxH page sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--angles", default=DEFAULT_ANGLES, help=f"comma-separated skew angles in degrees, use --angles=-3,2 for negative values (default: {DEFAULT_ANGLES})")
+    parser.add_argument("--noise", default=DEFAULT_NOISE, help=f"comma-separated salt-and-pepper noise fractions (default: {DEFAULT_NOISE})")
+    parser.add_argument("--layouts", default=",".join(LAYOUTS), help="comma-separated page layouts (default: all)")
+    parser.add_argument("--seed", type=int, default=0, help="base random seed (default: 0)")
+    parser.add_argument("--per-page", action="store_true", help="include every page's result in the report")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON report; exit with status 1 on regression")
+    parser.add_argument("--max-error-increase", type=float, default=0.1,
+                        help="allowed p95 error increase in degrees versus the baseline (default: 0.1)")
+    parser.add_argument("--max-slowdown", type=float, default=0.2,
+                        help="allowed throughput drop as a fraction versus the baseline (default: 0.2)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    methods = parse_list(args.methods)
+    unknown = [method for method in methods if method not in HOUGH_METHODS]
+    if unknown:
+        print(f"Unknown methods: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    cases = [
+        {'width': width, 'height': height, 'skew': skew, 'layout': layout, 'noise': noise,
+         'seed': args.seed + index}
+        for index, ((width, height), skew, layout, noise) in enumerate(itertools.product(
+            parse_list(args.sizes, parse_size), parse_list(args.angles, float),
+            parse_list(args.layouts), parse_list(args.noise, float)))
+    ]
+
+    results = []
+    pages = []
+    for method in methods:
+        print(f"Benchmarking {method} on {len(cases)} pages...", file=sys.stderr)
+        # 每种方法使用全新的进程，峰值常驻内存互不影响
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            run = executor.submit(run_method, method, cases).result()
+        results.append(summarize(run))
+        pages.extend(dict(page, method=method) for page in run['pages'])
+
+    report = {
+        'benchmark': "detection",
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'pillow': PIL.__version__
+        },
+        'config': {
+            'sizes': args.sizes, 'angles': args.angles, 'noise': args.noise,
+            'layouts': args.layouts, 'seed': args.seed
+        },
+        'results': results
+    }
+    if args.per_page:
+        report['pages'] = pages
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_with_baseline(report, json.load(f), args.max_error_increase, args.max_slowdown)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""输出编码基准：在样本图片上比较各编码预设的编码耗时和文件大小（JSON）
+
+样本按原扩展名保存（JPEG 按 PNG 保存），与纠偏输出一致；不指定样本时使用合成页面。
+
+用法示例：
+    python -m benchmarks.bench_encoding scans/ -o encoding.json
+    python -m benchmarks.bench_encoding --presets fast,smallest --limit 20 scans/
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import PIL
+from PIL import Image
+
+from deskew_core import (
+    ENCODER_PRESETS, SUPPORTED_EXTENSIONS, deskewed_filename, natural_sort, save_deskewed_image
+)
+from benchmarks.synthetic import render_page
+
+SYNTHETIC_SAMPLES = [  # (文件名, 图片模式)
+    ("synthetic_gray.png", 'L'),
+    ("synthetic_color.png", 'RGB'),
+    ("synthetic_color.webp", 'RGB'),
+    ("synthetic_gray.tif", 'L'),
+    ("synthetic_bilevel.tif", '1')
+]
+
+
+def parse_list(value):
+    return [part for part in value.split(',') if part.strip()]
+
+
+def collect_samples(inputs, limit):
+    """收集样本图片路径：文件直接加入，文件夹取其中支持的图片"""
+    samples = []
+    for path in inputs:
+        if os.path.isdir(path):
+            names = [name for name in os.listdir(path) if name.lower().endswith(SUPPORTED_EXTENSIONS)]
+            samples.extend(os.path.join(path, name) for name in natural_sort(names))
+        elif os.path.isfile(path):
+            samples.append(path)
+    return samples[:limit] if limit else samples
+
+
+def synthetic_samples(width, height):
+    """没有样本时生成合成页面（灰度、彩色、1 位）"""
+    page = render_page(width, height, 0, "figure", noise=0.01)
+    for filename, mode in SYNTHETIC_SAMPLES:
+        if mode == '1':
+            yield filename, page.point(lambda value: 255 if value > 128 else 0).convert('1')
+        else:
+            yield filename, page.convert(mode)
+
+
+def load_samples(paths):
+    for path in paths:
+        image = Image.open(path)
+        image.load()
+        yield os.path.basename(path), image
+
+
+def encode_once(image, filename, preset, folder):
+    """编码一次，返回 (秒数, 字节数)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        saved_filename = save_deskewed_image(image, folder, filename, preset)
+        seconds = time.perf_counter() - start
+    path = os.path.join(folder, saved_filename)
+    size = os.path.getsize(path)
+    os.remove(path)
+    return seconds, size
+
+
+def summarize(records, presets):
+    """按预设汇总耗时和大小，并给出相对 smallest 预设（或第一个预设）的比例"""
+    reference = "smallest" if "smallest" in presets else presets[0]
+    totals = {}
+    for preset in presets:
+        rows = [row for row in records if row['preset'] == preset]
+        seconds = sum(row['seconds'] for row in rows)
+        size = sum(row['bytes'] for row in rows)
+        formats = {}
+        for row in rows:
+            group = formats.setdefault(row['format'], {'files': 0, 'seconds': 0.0, 'bytes': 0})
+            group['files'] += 1
+            group['seconds'] += row['seconds']
+            group['bytes'] += row['bytes']
+        totals[preset] = {
+            'files': len(rows),
+            'seconds': round(seconds, 3),
+            'megabytes': round(size / (1024 * 1024), 3),
+            'files_per_second': round(len(rows) / seconds, 3) if seconds > 0 else None,
+            'by_format': {fmt: dict(group, seconds=round(group['seconds'], 3)) for fmt, group in sorted(formats.items())}
+        }
+    for preset, total in totals.items():
+        base = totals[reference]
+        total['time_vs_' + reference] = round(total['seconds'] / base['seconds'], 3) if base['seconds'] else None
+        total['size_vs_' + reference] = round(total['megabytes'] / base['megabytes'], 3) if base['megabytes'] else None
+    return totals
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="bench_encoding",
+        description="Output encoder preset benchmark: encode time versus file size (JSON output)."
+    )
+    parser.add_argument("inputs", nargs="*", help="sample pictures or folders (default: synthetic pages)")
+    parser.add_argument("--presets", default=",".join(ENCODER_PRESETS),
+                        help="comma-separated encoder presets (default: all)")
+    parser.add_argument("--limit", type=int, default=None, help="use at most this many sample files")
+    parser.add_argument("--size", default="2480x3508", help="synthetic page size WxH (default: 2480x3508)")
+    parser.add_argument("--repeat", type=int, default=1, help="encodes per file and preset, the fastest is reported (default: 1)")
+    parser.add_argument("--per-file", action="store_true", help="include every file's result in the report")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file instead of stdout")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    presets = parse_list(args.presets)
+    unknown = [preset for preset in presets if preset not in ENCODER_PRESETS]
+    if unknown:
+        print(f"Unknown presets: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    if args.inputs:
+        paths = collect_samples(args.inputs, args.limit)
+        if not paths:
+            print("No valid picture files found", file=sys.stderr)
+            return 1
+        samples = load_samples(paths)
+    else:
+        width, height = (int(value) for value in args.size.lower().split('x'))
+        samples = synthetic_samples(width, height)
+
+    records = []
+    with tempfile.TemporaryDirectory() as folder:
+        for filename, image in samples:
+            print(f"Encoding {filename} ({image.mode} {image.size[0]}x{image.size[1]})...", file=sys.stderr)
+            for preset in presets:
+                runs = [encode_once(image, filename, preset, folder) for _ in range(max(1, args.repeat))]
+                records.append({
+                    'file': filename,
+                    'format': os.path.splitext(deskewed_filename(filename))[1].lower(),
+                    'mode': image.mode,
+                    'preset': preset,
+                    'seconds': round(min(seconds for seconds, _ in runs), 4),
+                    'bytes': runs[0][1]
+                })
+
+    report = {
+        'benchmark': "encoding",
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'pillow': PIL.__version__
+        },
+        'config': {'presets': presets, 'samples': args.inputs or f"synthetic {args.size}", 'repeat': args.repeat},
+        'presets': {preset: ENCODER_PRESETS[preset] for preset in presets},
+        'results': summarize(records, presets)
+    }
+    if args.per_file:
+        report['files'] = records
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""旋转引擎基准：比较 PIL 与 OpenCV 旋转（扩展画布和尺寸锁定两种方式）的耗时与结果差异（JSON）
+
+用法示例：
+    python -m benchmarks.bench_rotation -o rotation.json
+    python -m benchmarks.bench_rotation --sizes 4960x7016 --modes RGB,L --angles=-3,0.5
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+import PIL
+from PIL import Image
+
+from deskew_core import RESAMPLE_FILTERS, rotate_image, rotate_to_size
+from benchmarks.synthetic import render_page
+
+DEFAULT_SIZES = "2480x3508,4960x7016"  # A4 300dpi / 600dpi
+DEFAULT_MODES = "RGB,RGBA,L,P,1"
+DEFAULT_ANGLES = "-3,0.5,7"
+FILL_COLOR = (240, 235, 220)
+
+
+def parse_list(value, convert=str):
+    return [convert(part) for part in value.split(',') if part.strip()]
+
+
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def make_image(width, height, mode, seed):
+    """合成页面转换为指定模式；RGBA 页面带一块半透明区域，P 页面带透明色"""
+    page = render_page(width, height, 0, "figure", seed=seed).convert('RGB')
+    if mode == 'RGBA':
+        page = page.convert('RGBA')
+        alpha = np.full((height, width), 255, dtype=np.uint8)
+        alpha[:height // 4] = 128
+        page.putalpha(Image.fromarray(alpha))
+    elif mode == 'P':
+        page = page.convert('P', palette=Image.ADAPTIVE, colors=64)
+        page.info['transparency'] = 0
+    elif mode != 'RGB':
+        page = page.convert(mode)
+    return page
+
+
+def mean_difference(first, second):
+    """两幅结果的平均绝对差（按 RGBA 比较，0~255）"""
+    first = np.asarray(first.convert('RGBA'), dtype=np.int16)
+    second = np.asarray(second.convert('RGBA'), dtype=np.int16)
+    return round(float(np.abs(first - second).mean()), 3)
+
+
+def best_of(function, repeat):
+    """重复运行取最短耗时，返回 (秒数, 结果)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, result
+
+
+def run_case(image, angle, repeat):
+    """一张图片、一个角度：PIL 基准与各 OpenCV 插值方式的扩展旋转和尺寸锁定旋转"""
+    timings = {}
+    pil_seconds, pil_result = best_of(lambda: rotate_image(image, angle, FILL_COLOR, "pil"), repeat)
+    pil_locked_seconds, pil_locked = best_of(
+        lambda: rotate_to_size(image, angle, image.size, FILL_COLOR, "pil"), repeat)
+    timings['pil'] = {'expand_s': round(pil_seconds, 4), 'locked_s': round(pil_locked_seconds, 4)}
+
+    for resample in RESAMPLE_FILTERS:
+        seconds, result = best_of(lambda: rotate_image(image, angle, FILL_COLOR, "opencv", resample), repeat)
+        locked_seconds, locked = best_of(
+            lambda: rotate_to_size(image, angle, image.size, FILL_COLOR, "opencv", resample), repeat)
+        timings[f"opencv_{resample}"] = {
+            'expand_s': round(seconds, 4),
+            'locked_s': round(locked_seconds, 4),
+            'speedup': round(pil_seconds / seconds, 2) if seconds > 0 else None,
+            'locked_speedup': round(pil_locked_seconds / locked_seconds, 2) if locked_seconds > 0 else None,
+            'mean_abs_diff': mean_difference(pil_result, result),
+            'locked_mean_abs_diff': mean_difference(pil_locked, locked)
+        }
+    return timings
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="bench_rotation",
+        description="Rotation engine benchmark: PIL versus multi-threaded OpenCV (JSON output)."
+    )
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated WxH page sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--modes", default=DEFAULT_MODES, help=f"comma-separated PIL image modes (default: {DEFAULT_MODES})")
+    parser.add_argument("--angles", default=DEFAULT_ANGLES, help=f"comma-separated angles in degrees, use --angles=-3,2 for negative values (default: {DEFAULT_ANGLES})")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the fastest is reported (default: 3)")
+    parser.add_argument("--threads", type=int, default=None, help="OpenCV thread count (default: OpenCV's choice)")
+    parser.add_argument("-o", "--output", help="write the JSON report to this file instead of stdout")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    results = []
+    for seed, ((width, height), mode) in enumerate(itertools.product(
+            parse_list(args.sizes, parse_size), parse_list(args.modes))):
+        image = make_image(width, height, mode, seed)
+        for angle in parse_list(args.angles, float):
+            print(f"Rotating {width}x{height} {mode} by {angle}°...", file=sys.stderr)
+            results.append({'size': f"{width}x{height}", 'mode': mode, 'angle': angle,
+                            **run_case(image, angle, args.repeat)})
+
+    report = {
+        'benchmark': "rotation",
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'opencv_threads': cv2.getNumThreads(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'pillow': PIL.__version__
+        },
+        'config': {'sizes': args.sizes, 'modes': args.modes, 'angles': args.angles, 'repeat': args.repeat},
+        'results': results
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
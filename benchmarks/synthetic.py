@@ -0,0 +1,99 @@
+"""合成倾斜文档页面 - 已知倾斜角度、分辨率、噪声和版式，供基准测试使用"""
+import random
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+LAYOUTS = ["text", "columns", "figure"]
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt "
+    "ut labore et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco "
+    "laboris nisi aliquip ex ea commodo consequat duis aute irure in reprehenderit voluptate "
+    "velit esse cillum fugiat nulla pariatur excepteur sint occaecat cupidatat non proident"
+).split()
+
+
+def load_font(size):
+    """可缩放字体（需要 FreeType），不可用时退回固定大小的位图字体"""
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, OSError, ImportError):
+        return ImageFont.load_default()
+
+
+def draw_paragraphs(draw, rng, font, font_px, box):
+    """在 box=(left, top, right, bottom) 内排版随机段落"""
+    left, top, right, bottom = box
+    line_height = int(font_px * 1.6)
+    space = draw.textlength(' ', font=font)
+    word_widths = {word: draw.textlength(word, font=font) for word in WORDS}
+    y = top
+    while y + line_height <= bottom:
+        # 段落结束时留短行和段间距
+        if rng.random() < 0.12:
+            y += line_height // 2
+            width_limit = (right - left) * rng.uniform(0.3, 0.8)
+        else:
+            width_limit = right - left
+        words = []
+        line_width = -space
+        while True:
+            word = rng.choice(WORDS)
+            line_width += space + word_widths[word]
+            if line_width > width_limit:
+                break
+            words.append(word)
+        if words:
+            draw.text((left, y), ' '.join(words), fill=0, font=font)
+        y += line_height
+
+
+def render_page(width, height, skew, layout="text", noise=0.0, seed=0):
+    """渲染一张灰度文档页面并按 skew 度（逆时针）旋转
+
+    检测器对该页应给出的文本行角度为 -skew。noise 为椒盐噪声的像素比例。
+    """
+    rng = random.Random(seed)
+    font_px = max(10, width // 60)
+    font = load_font(font_px)
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    margin = width // 10
+
+    if layout == "columns":
+        gutter = width // 25
+        column_width = (width - 2 * margin - gutter) // 2
+        for column in range(2):
+            left = margin + column * (column_width + gutter)
+            draw_paragraphs(draw, rng, font, font_px, (left, margin, left + column_width, height - margin))
+    elif layout == "figure":
+        # 上部正文，中部照片和折线图，下部正文
+        figure_top = int(height * 0.35)
+        figure_bottom = int(height * 0.65)
+        draw_paragraphs(draw, rng, font, font_px, (margin, margin, width - margin, figure_top - font_px))
+        draw_paragraphs(draw, rng, font, font_px, (margin, figure_bottom + font_px, width - margin, height - margin))
+
+        photo_right = width // 2 - margin // 4
+        photo = np.random.default_rng(seed).integers(0, 256, (figure_bottom - figure_top, photo_right - margin),
+                                                     dtype=np.uint8)
+        page.paste(Image.fromarray(photo, 'L'), (margin, figure_top))
+
+        chart_left = width // 2 + margin // 4
+        points = [(chart_left + i * (width - margin - chart_left) // 8,
+                   rng.randint(figure_top, figure_bottom)) for i in range(9)]
+        draw.line(points, fill=0, width=max(2, font_px // 5))
+        draw.rectangle((chart_left, figure_top, width - margin, figure_bottom), outline=0,
+                       width=max(1, font_px // 8))
+    else:
+        draw_paragraphs(draw, rng, font, font_px, (margin, margin, width - margin, height - margin))
+
+    page = page.rotate(skew, resample=Image.BICUBIC, fillcolor=255)
+
+    if noise > 0:
+        pixels = np.array(page)
+        noise_rng = np.random.default_rng(seed + 1)
+        flip = noise_rng.random(pixels.shape) < noise
+        pixels[flip] = noise_rng.choice(np.array([0, 255], dtype=np.uint8), size=int(flip.sum()))
+        page = Image.fromarray(pixels, 'L')
+
+    return page
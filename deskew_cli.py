@@ -0,0 +1,178 @@
+"""图文纠偏命令行批量模式 - 无需图形界面，不导入 tkinter
+
+用法示例：
+    python deskew_cli.py scans/ extra.png -o out/ --method optimized --fill-color 255,255,255 -j 8
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from PIL import ImageColor
+
+from deskew_core import (
+    DEFAULT_BG_COLOR, SUPPORTED_EXTENSIONS, HOUGH_METHODS, ANGLE_CACHE_FILENAME,
+    ROTATION_BACKENDS, DEFAULT_ROTATION_BACKEND, RESAMPLE_FILTERS, ENCODER_PRESETS, DEFAULT_ENCODER_PRESET,
+    STRIP_MEMORY_BUDGET, UNCHANGED_OUTPUT_MODES, BatchDeskewPipeline, natural_sort, enable_stage_timings,
+    deskewed_filename
+)
+
+
+def parse_fill_color(value):
+    """解析填充色：支持 "255,255,255"、"#FFFFFF" 或颜色名"""
+    try:
+        if ',' in value:
+            color = tuple(int(part) for part in value.split(','))
+            if len(color) != 3 or not all(0 <= c <= 255 for c in color):
+                raise ValueError(value)
+            return color
+        return ImageColor.getrgb(value)[:3]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid fill color: {value}")
+
+
+def collect_input_files(paths):
+    """收集输入图片：文件夹内的图片按自然顺序排列，文件按给出的顺序，重复给出的图片只处理一次"""
+    input_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames = [f for f in os.listdir(path) if f.lower().endswith(SUPPORTED_EXTENSIONS)]
+            input_files.extend(os.path.join(path, f) for f in natural_sort(filenames))
+        elif os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS):
+            input_files.append(path)
+        else:
+            print(f"Skipped (not a supported picture or folder): {path}", file=sys.stderr)
+    seen = set()
+    unique_files = []
+    for file_path in input_files:
+        real_path = os.path.normcase(os.path.realpath(file_path))
+        if real_path not in seen:
+            seen.add(real_path)
+            unique_files.append(file_path)
+    return unique_files
+
+
+def build_parser():
+    """创建命令行参数解析器"""
+    parser = argparse.ArgumentParser(
+        prog="deskew_cli",
+        description="PicdocDeskew headless batch deskew (no GUI required)."
+    )
+    parser.add_argument("inputs", nargs="+", help="picture files or folders to deskew")
+    parser.add_argument("-o", "--output", required=True, help="output folder for deskewed pictures")
+    parser.add_argument("-m", "--method", choices=HOUGH_METHODS, default="optimized",
+                        help="angle detection method (default: optimized)")
+    parser.add_argument("-c", "--fill-color", type=parse_fill_color, default=DEFAULT_BG_COLOR,
+                        help="fill color for rotated borders, e.g. 255,255,255 or #FFFFFF (default: white)")
+    parser.add_argument("--no-lock-size", dest="lock_size", action="store_false",
+                        help="keep the expanded canvas instead of cropping back to the original size")
+    parser.add_argument("--rotation-backend", choices=ROTATION_BACKENDS, default=DEFAULT_ROTATION_BACKEND,
+                        help=f"rotation engine, opencv is multi-threaded (default: {DEFAULT_ROTATION_BACKEND})")
+    parser.add_argument("--resample", choices=list(RESAMPLE_FILTERS), default="bicubic",
+                        help="rotation interpolation, lanczos needs the opencv backend (default: bicubic)")
+    parser.add_argument("--preset", choices=list(ENCODER_PRESETS), default=DEFAULT_ENCODER_PRESET,
+                        help=f"output encoder preset, fast encodes quickest and smallest gives the smallest files (default: {DEFAULT_ENCODER_PRESET})")
+    parser.add_argument("--memory-budget", type=int, metavar="MB", default=STRIP_MEMORY_BUDGET // (1024 * 1024),
+                        help="rotate and write pictures whose working memory would exceed MB in strips, 0 disables "
+                             f"(default: {STRIP_MEMORY_BUDGET // (1024 * 1024)})")
+    parser.add_argument("--unchanged", choices=UNCHANGED_OUTPUT_MODES, default="copy",
+                        help="how pictures that need no rotation reach the output folder: copied, hardlinked, "
+                             "reflinked (copy-on-write clone) or not written at all (default: copy)")
+    parser.add_argument("--no-pyramid", dest="use_pyramid", action="store_false",
+                        help="detect on the full-resolution page instead of coarse-to-fine")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="always re-detect instead of reusing angles cached in the output folder")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes (default: all cores)")
+    parser.add_argument("--timings", metavar="FILE",
+                        help="write per-picture stage timings to FILE (.csv for CSV, otherwise JSON lines)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="show per-page detection diagnostics")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    input_files = collect_input_files(args.inputs)
+    if not input_files:
+        print("No valid picture files found", file=sys.stderr)
+        return 1
+
+    output_folder = os.path.abspath(args.output)
+    angle_cache = os.path.join(output_folder, ANGLE_CACHE_FILENAME) if args.use_cache else None
+    tasks = []
+    output_owners = {}  # 输出文件名 -> 写入该文件的输入图片
+    for i, file_path in enumerate(input_files):
+        # 禁止输出覆盖原图
+        if os.path.dirname(os.path.abspath(file_path)) == output_folder:
+            print(f"Output folder must differ from input folder: {file_path}", file=sys.stderr)
+            return 2
+        # 所有输出写入同一文件夹，不同文件夹中的同名图片（或 x.jpg 与 x.png）会互相覆盖
+        filename = os.path.basename(file_path)
+        for output_name in {filename, deskewed_filename(filename)}:
+            owner = output_owners.setdefault(os.path.normcase(output_name), file_path)
+            if owner != file_path:
+                print(f"Output name conflict: {owner} and {file_path} would both write {output_name}",
+                      file=sys.stderr)
+                return 2
+        tasks.append({
+            'index': i,
+            'filename': filename,
+            'source_path': file_path,
+            'output_folder': output_folder,
+            'hough_method': args.method,
+            'bg_color': args.fill_color,
+            'lock_size': args.lock_size,
+            'use_existing_copy': False,
+            'use_pyramid': args.use_pyramid,
+            'angle_cache': angle_cache,
+            'rotation_backend': args.rotation_backend,
+            'resample': args.resample,
+            'encoder_preset': args.preset,
+            'memory_budget': args.memory_budget * 1024 * 1024,
+            'unchanged_output': args.unchanged
+        })
+
+    failed = []
+    method_counts = {}
+
+    def on_progress(result, processed, total):
+        if result['error']:
+            failed.append(result['filename'])
+            print(f"[{processed}/{total}] {result['filename']}: FAILED ({result['error']})")
+            return
+        method = result['detection_method']
+        method_counts[method] = method_counts.get(method, 0) + 1
+        detail = f"{method}, confidence {result['confidence']:.2f}"
+        if result['angle']:
+            print(f"[{processed}/{total}] {result['filename']} -> {result['saved_filename']} "
+                  f"(rotated {result['angle']:.2f}°; {detail})")
+        else:
+            print(f"[{processed}/{total}] {result['filename']} (no rotation needed; {detail})")
+
+    stage_timings = enable_stage_timings() if args.timings else None
+    pipeline = BatchDeskewPipeline(
+        tasks, max_workers=args.workers, on_progress=on_progress, quiet=not args.verbose
+    )
+    try:
+        processed = pipeline.run()
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        return 130
+
+    print(f"Batch deskew complete, processed {processed} pictures, {len(failed)} failed")
+    if stage_timings is not None:
+        stage_timings.write(args.timings)
+        for stage, total in sorted(stage_timings.summary().items(), key=lambda item: -item[1]['seconds']):
+            print(f"  {stage:<12} {total['seconds']:8.2f}s  x{total['count']}")
+        print(f"Stage timings written to {args.timings}")
+    if len(method_counts) > 1:
+        print("Detection methods used: " +
+              ", ".join(f"{method} {count}" for method, count in sorted(method_counts.items(),
+                                                                        key=lambda item: -item[1])))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,2105 @@
+"""图文纠偏核心处理模块 - 不依赖 tkinter，供界面与批量流水线共用"""
+import csv
+import hashlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+import cv2
+import numpy as np
+from PIL import Image, ImageFile
+
+# 常量定义
+DEFAULT_BG_COLOR = (255, 255, 255)
+SUPPORTED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tiff', '.tif', 
+                        '.webp', '.ico', '.ppm', '.pgm', '.pbm')
+DESKEW_FOLDER_NAME = "Deskew"
+HOUGH_METHODS = ["standard", "probabilistic", "optimized", "projection", "fourier", "tiles", "cascade"]
+SELF_SCALING_METHODS = ("projection", "fourier", "tiles")  # 自行在缩小图上检测的方法，不使用金字塔
+MIN_ROTATION_ANGLE = 0.1  # 小于该角度视为无需旋转
+ROTATION_BACKENDS = ["opencv", "pil"]  # 旋转引擎：OpenCV 多线程 / PIL 单线程
+DEFAULT_ROTATION_BACKEND = "opencv"
+RESAMPLE_FILTERS = {"bicubic": cv2.INTER_CUBIC, "lanczos": cv2.INTER_LANCZOS4}  # OpenCV 旋转的插值方式
+OPENCV_ROTATE_MODES = ('L', 'LA', 'RGB', 'RGBA', 'P', '1')  # 可由 OpenCV 旋转的图片模式
+DETECTION_MAX_SIZE = 2000  # 检测用到的最大工作分辨率（长边像素数），更大的图片按整数倍缩小后再检测
+REDUCIBLE_MODES = ('L', 'LA', 'RGB', 'RGBA')  # Image.reduce 直接支持的模式，其余模式先转灰度
+
+# 多分辨率（金字塔）检测参数
+PYRAMID_MIN_SIZE = 2000  # 长边超过该像素数才启用金字塔检测
+PYRAMID_COARSE_SIZE = 800  # 粗检测层长边像素数
+PYRAMID_FINE_SIZE = 2000  # 精检测层长边像素数
+PYRAMID_REFINE_WINDOW = 4.0  # 精检测角度窗口（粗检测角度 ± 该值）
+PYRAMID_REFINE_THETA = np.pi / 1800  # 标准霍夫精检测的角度步长（0.1°）
+
+# 投影轮廓法参数
+PROJECTION_SIZE = 1200  # 投影检测工作分辨率（长边像素数）
+PROJECTION_COARSE_STEP = 0.5  # 粗扫描角度步长（度）
+PROJECTION_FINE_STEP = 0.05  # 细扫描角度步长（度）
+PROJECTION_MIN_PIXELS = 100  # 文本像素少于该值时放弃检测
+PROJECTION_MAX_PIXELS = 300000  # 文本像素多于该值时随机抽样
+
+# 频谱法参数
+FOURIER_SIZE = 1024  # 频谱检测工作分辨率（长边像素数）
+FOURIER_ANGLE_STEP = 0.1  # 角向能量分布的角度分辨率（度）
+FOURIER_MIN_FREQUENCY = 0.06  # 参与统计的最低空间频率（周期/像素），排除页面整体结构和角向分辨率过粗的低频
+FOURIER_MAX_FREQUENCY = 0.5  # 参与统计的最高空间频率（周期/像素），高次谐波角向分辨率最细
+
+# 分块投票参数
+TILE_WORK_SIZE = 2000  # 分块检测工作分辨率（长边像素数）
+TILE_GRID = 5  # 长边方向的分块数量，分块边长随页面尺寸变化
+TILE_COUNT = 8  # 参与投票的分块数量
+TILE_MIN_INK = 0.03  # 墨迹密度低于该值的分块视为空白边距
+TILE_MAX_INK = 0.4  # 墨迹密度高于该值的分块视为图片或照片
+TILE_VOTE_TOLERANCE = 1.0  # 两个分块角度相差不超过该值（度）视为一致
+
+# 置信度与级联检测参数
+CONFIDENCE_TOLERANCE = 1.0  # 与结果角度相差不超过该值（度）的直线视为支持该结果
+CONFIDENCE_MIN_LINES = 10  # 直线数量达到该值时置信度不再因数量不足而折减
+CASCADE_METHODS = ["fourier", "tiles", "projection", "optimized", "standard"]  # 级联检测顺序（由快到慢）
+CASCADE_MIN_CONFIDENCE = 0.3  # 置信度达到该值即停止级联
+
+ANGLE_ESTIMATORS = ["mean", "median", "trimmed", "peak"]
+TRIMMED_MEAN_FRACTION = 0.1  # 截尾均值两端各去除的权重比例
+HISTOGRAM_BINS = 30
+
+# 角度缓存参数
+ANGLE_CACHE_FILENAME = ".deskew_angles.sqlite"  # 缓存数据库文件名（位于输出文件夹）
+ANGLE_CACHE_VERSION = 3  # 检测算法或参数调整后递增，使旧缓存失效
+SAVE_QUEUE_MAX_BYTES = 1024 * 1024 * 1024  # 后台保存队列中排队图片的内存上限
+UNCHANGED_OUTPUT_MODES = ["none", "copy", "hardlink", "reflink"]  # 无需旋转的图片写入输出文件夹的方式
+FICLONE = 0x40049409  # Linux ioctl：克隆文件数据块（写时复制）
+DECODED_CACHE_MAX_BYTES = 768 * 1024 * 1024  # 界面预解码缓存的内存上限（按像素数据量计）
+
+# 分条处理参数（超大图片旋转和保存时不生成整幅结果，按条旋转并逐条写入文件）
+STRIP_MEMORY_BUDGET = 256 * 1024 * 1024  # 旋转和编码的工作内存上限（不含已解码的原图）
+STRIP_FORMATS = ('.png', '.tif', '.tiff')  # 可逐条写入的输出格式
+STRIP_MODES = ('1', 'L', 'LA', 'RGB', 'RGBA')  # 可分条处理的图片模式
+STRIP_MIN_ROWS = 16  # 每条最少行数
+STRIP_TILE_WIDTH = 8192  # 每条再按该宽度分块变换（cv2.warpAffine 要求尺寸小于 32767）
+STRIP_MARGIN = 4  # 原图区域在插值核方向上多取的像素数（Lanczos 核半径）
+
+# 输出编码预设：fast 编码最快，smallest 文件最小，balanced 居中（默认）
+# OpenCV 编码 PNG 时逐行自适应选择滤波器，彩色页面比 PIL 小约 20%，因此 PNG 默认由 OpenCV 编码
+ENCODER_PRESETS = {
+    "fast": {
+        'opencv_formats': ('.png',),  # 这些格式的 L、RGB、RGBA 图片由 OpenCV 编码，其余使用 PIL
+        'png_compress_level': 1,
+        'png_optimize': False,
+        'webp_method': 0,
+        'webp_quality': 0,
+        'gif_optimize': False,
+        'tiff_compression': "tiff_lzw",
+        'tiff_bilevel_compression': "group4"
+    },
+    "balanced": {
+        'opencv_formats': ('.png',),
+        'png_compress_level': 6,
+        'png_optimize': False,
+        'webp_method': 4,
+        'webp_quality': 80,
+        'gif_optimize': True,
+        'tiff_compression': "tiff_deflate",
+        'tiff_bilevel_compression': "group4"
+    },
+    "smallest": {
+        'opencv_formats': ('.png',),  # png_optimize 时与 PIL 的优化结果比较，保留较小者
+        'png_compress_level': 9,
+        'png_optimize': True,
+        'webp_method': 6,
+        'webp_quality': 90,
+        'gif_optimize': True,
+        'tiff_compression': "tiff_deflate",
+        'tiff_bilevel_compression': "group4"
+    }
+}
+DEFAULT_ENCODER_PRESET = "balanced"
+OPENCV_ENCODE_FORMATS = ('.png',)  # 可由 OpenCV 编码的格式
+
+# 启用PIL对所有格式的支持
+ImageFile.LOAD_TRUNCATED_IMAGES = True
+# 大幅面扫描件（地图、工程图、1200 dpi 扫描）远超 PIL 默认的解压炸弹像素上限，处理的是用户自己的文件，取消该限制
+Image.MAX_IMAGE_PIXELS = None
+
+
+# ---- 阶段计时 ----
+
+class StageTimings:
+    """各处理阶段的耗时记录：每条记录为 {image, stage, seconds, bytes, pid, time}，可导出为 JSON lines 或 CSV"""
+    
+    FIELDS = ['image', 'stage', 'seconds', 'bytes', 'pid', 'time']
+    
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+    
+    def add(self, image, stage, seconds, nbytes=None):
+        record = {
+            'image': image,
+            'stage': stage,
+            'seconds': round(seconds, 6),
+            'bytes': nbytes,
+            'pid': os.getpid(),
+            'time': round(time.time(), 3)
+        }
+        with self._lock:
+            self.records.append(record)
+    
+    def extend(self, records):
+        """合并其他进程（批量工作进程）返回的记录"""
+        with self._lock:
+            self.records.extend(records)
+    
+    def summary(self):
+        """按阶段汇总：{stage: {'count', 'seconds', 'bytes'}}"""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {'count': 0, 'seconds': 0.0, 'bytes': 0})
+            total['count'] += 1
+            total['seconds'] += record['seconds']
+            total['bytes'] += record['bytes'] or 0
+        return totals
+    
+    def write(self, path):
+        """按扩展名导出：.csv 为 CSV，其余为 JSON lines"""
+        with self._lock:
+            records = list(self.records)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            if path.lower().endswith('.csv'):
+                writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+                writer.writeheader()
+                writer.writerows(records)
+            else:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+_stage_timings = None  # 未启用时为 None，timed_stage 不做任何记录
+_timing_context = threading.local()  # 当前线程正在处理的图片名
+
+
+def enable_stage_timings(timings=None):
+    """启用阶段计时，返回记录对象"""
+    global _stage_timings
+    _stage_timings = timings or StageTimings()
+    return _stage_timings
+
+
+def disable_stage_timings():
+    """停用阶段计时，返回已收集的记录对象"""
+    global _stage_timings
+    timings, _stage_timings = _stage_timings, None
+    return timings
+
+
+def current_stage_timings():
+    return _stage_timings
+
+
+def current_timing_image():
+    return getattr(_timing_context, 'image', None)
+
+
+@contextmanager
+def timing_image(image):
+    """在该上下文内记录的阶段归属于指定图片（按线程区分）"""
+    previous = current_timing_image()
+    _timing_context.image = image
+    try:
+        yield
+    finally:
+        _timing_context.image = previous
+
+
+@contextmanager
+def timed_stage(stage):
+    """记录一个处理阶段的耗时；可在上下文内设置 info['bytes'] 记录数据量"""
+    timings = _stage_timings
+    if timings is None:
+        yield {}
+        return
+    info = {'bytes': None}
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        timings.add(current_timing_image(), stage, time.perf_counter() - start, info['bytes'])
+
+
+def image_nbytes(image):
+    """PIL图片的像素数据量（字节）"""
+    return image.width * image.height * len(image.getbands())
+
+
+# ---- 直线角度聚合（向量化） ----
+
+def wrap_angles(angles):
+    """将角度（度）调整到[-90, 90)范围"""
+    return (angles + 90) % 180 - 90
+
+
+def hough_line_angles(lines):
+    """标准霍夫结果 (N,1,2) [rho, theta] -> 相对水平线的角度数组（度）"""
+    theta = lines.reshape(-1, 2)[:, 1].astype(np.float64)
+    return wrap_angles(np.degrees(theta) - 90)
+
+
+def segment_geometry(lines):
+    """概率霍夫结果 (N,1,4) [x1, y1, x2, y2] -> (角度, dx, dy, 长度) 数组"""
+    segments = lines.reshape(-1, 4).astype(np.float64)
+    dx = segments[:, 2] - segments[:, 0]
+    dy = segments[:, 3] - segments[:, 1]
+    angles = wrap_angles(np.degrees(np.arctan2(dy, dx)))
+    lengths = np.hypot(dx, dy)
+    return angles, dx, dy, lengths
+
+
+def weighted_median(values, weights):
+    """加权中位数"""
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    return float(values[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+
+
+def trimmed_mean(values, weights, fraction=TRIMMED_MEAN_FRACTION):
+    """加权截尾均值：按角度排序后两端各去除 fraction 比例的权重"""
+    order = np.argsort(values)
+    values = values[order]
+    weights = weights[order]
+    cumulative = np.cumsum(weights)
+    total = cumulative[-1]
+    keep = (cumulative > total * fraction) & (cumulative - weights < total * (1 - fraction))
+    if not np.any(keep) or weights[keep].sum() <= 0:
+        return weighted_median(values, weights)
+    return float(np.average(values[keep], weights=weights[keep]))
+
+
+def histogram_peak(values, weights, value_range, bins=HISTOGRAM_BINS):
+    """直方图峰值，对峰值两侧的分箱做抛物线插值得到亚分箱精度"""
+    hist, edges = np.histogram(values, bins=bins, range=value_range, weights=weights)
+    peak = int(np.argmax(hist))
+    offset = 0.0
+    if 0 < peak < bins - 1:
+        left, center, right = hist[peak - 1], hist[peak], hist[peak + 1]
+        denominator = left - 2 * center + right
+        if denominator != 0:
+            offset = float(np.clip(0.5 * (left - right) / denominator, -0.5, 0.5))
+    bin_width = edges[1] - edges[0]
+    return float(edges[peak] + bin_width * (0.5 + offset))
+
+
+def aggregate_angles(angles, weights=None, estimator="mean", angle_range=(-30, 30)):
+    """按指定估计方法合并角度：mean 加权平均、median 加权中位数、trimmed 截尾均值、peak 直方图峰值"""
+    if weights is None:
+        weights = np.ones_like(angles)
+    if estimator == "median":
+        return weighted_median(angles, weights)
+    elif estimator == "trimmed":
+        return trimmed_mean(angles, weights)
+    elif estimator == "peak":
+        return histogram_peak(angles, weights, angle_range)
+    return float(np.average(angles, weights=weights))
+
+
+def angle_confidence(angles, weights, angle):
+    """直线对结果角度的支持程度（0~1）：容差内直线的权重占比，直线过少时按数量折减"""
+    if weights is None:
+        weights = np.ones_like(angles)
+    total = weights.sum()
+    if angles.size == 0 or total <= 0:
+        return 0.0
+    support = weights[np.abs(angles - angle) <= CONFIDENCE_TOLERANCE].sum() / total
+    return float(support * min(1.0, angles.size / CONFIDENCE_MIN_LINES))
+
+
+class DetectionResult:
+    """角度检测结果
+    
+    angle 为文本行角度；confidence 为置信度（0~1，未检测到时为0）；line_count 为参与统计的
+    直线（分块法为一致的分块内直线，投影法为文本行，频谱法不统计）数量；seconds 为检测耗时；
+    method 为实际给出结果的检测方法；fallback 表示未检测到有效直线而返回了备用角度。
+    rotation_angle 只在 analyze_image 的结果中设置，为两点法换算后的旋转角度。
+    """
+    
+    def __init__(self, angle, confidence=0.0, line_count=0, seconds=0.0, method=None, fallback=False):
+        self.angle = float(angle)
+        self.confidence = float(confidence)
+        self.line_count = int(line_count)
+        self.seconds = float(seconds)
+        self.method = method
+        self.fallback = fallback
+        self.rotation_angle = None
+    
+    @classmethod
+    def failed(cls, fallback_angle, method=None):
+        """未检测到有效直线时的结果"""
+        return cls(fallback_angle or 0.0, method=method, fallback=True)
+    
+    def to_dict(self):
+        return {
+            'angle': self.angle,
+            'confidence': self.confidence,
+            'line_count': self.line_count,
+            'seconds': self.seconds,
+            'method': self.method,
+            'fallback': self.fallback
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['angle'], data['confidence'], data['line_count'], data['seconds'],
+                   data['method'], data['fallback'])
+    
+    def __repr__(self):
+        return (f"DetectionResult(angle={self.angle:.2f}, confidence={self.confidence:.2f}, "
+                f"lines={self.line_count}, method={self.method}, fallback={self.fallback})")
+
+
+def image_content_hash(image):
+    """计算图片像素内容的哈希（与文件格式、元数据无关）"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode())
+    if image.mode == 'P':
+        digest.update(bytes(image.getpalette() or []))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class AngleCache:
+    """持久化角度缓存 - SQLite 数据库，按内容哈希 + 检测方法 + 参数记录检测结果
+    
+    重复运行、切换方法对比和中断后继续的批量纠偏可跳过未变化图片的检测。
+    多个工作进程可同时读写同一数据库。
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30)
+        try:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.DatabaseError:
+            pass  # 部分文件系统不支持WAL，使用默认日志模式
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS angles ("
+            "content_hash TEXT NOT NULL, method TEXT NOT NULL, params TEXT NOT NULL, "
+            "detected_angle REAL NOT NULL, rotation_angle REAL NOT NULL, "
+            "diagnostics TEXT, created REAL NOT NULL, "
+            "PRIMARY KEY (content_hash, method, params))"
+        )
+        self.connection.commit()
+    
+    @classmethod
+    def for_folder(cls, folder):
+        """打开（必要时创建）文件夹中的缓存数据库，失败时返回 None"""
+        try:
+            os.makedirs(folder, exist_ok=True)
+            return cls(os.path.join(folder, ANGLE_CACHE_FILENAME))
+        except (OSError, sqlite3.Error) as e:
+            print(f"Angle cache unavailable: {e}")
+            return None
+    
+    def get(self, content_hash, method, params):
+        """查询缓存，命中时返回 (detected_angle, rotation_angle, diagnostics)"""
+        try:
+            row = self.connection.execute(
+                "SELECT detected_angle, rotation_angle, diagnostics FROM angles "
+                "WHERE content_hash = ? AND method = ? AND params = ?",
+                (content_hash, method, params)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Angle cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2]) if row[2] else {}
+    
+    def put(self, content_hash, method, params, detected_angle, rotation_angle, diagnostics=None):
+        """写入检测结果（同一键覆盖旧记录）"""
+        try:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO angles VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (content_hash, method, params, float(detected_angle), float(rotation_angle),
+                 json.dumps(diagnostics or {}), time.time())
+            )
+            self.connection.commit()
+        except sqlite3.Error as e:
+            print(f"Angle cache write failed: {e}")
+    
+    def close(self):
+        self.connection.close()
+
+
+class DeskewDetector:
+    """倾斜角度检测类 - 使用霍夫变换方法"""
+    
+    def __init__(self, hough_method="optimized", use_pyramid=True, angle_estimator=None, angle_cache=None):
+        self.hough_method = hough_method  # 默认使用优化版霍夫变换
+        self.use_pyramid = use_pyramid  # 大图使用由粗到精的多分辨率检测
+        self.angle_estimator = angle_estimator  # 角度合并方法，为空时使用各霍夫方法的默认方法
+        self.angle_cache = angle_cache  # 可选的持久化角度缓存（AngleCache）
+    
+    def preprocess_image(self, pil_image):
+        """预处理PIL图像：转灰度、二值化"""
+        with timed_stage("preprocess") as info:
+            # 由PIL直接转灰度（透明通道忽略），不构造彩色数组
+            if pil_image.mode != 'L':
+                pil_image = pil_image.convert('L')
+            gray = np.asarray(pil_image)
+            
+            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)  # 背景白色=255，文本黑色=0
+            info['bytes'] = binary.nbytes
+        return binary
+    
+    def detect_angle_hough(self, binary, angle_range=(-30, 30), rho_resolution=1, theta_resolution=np.pi/180, threshold=100,
+                           scale=1.0, fallback=0, estimator=None):
+        """使用标准霍夫变换检测文本行角度
+        
+        scale 为工作分辨率相对原图的缩放比例，像素相关参数按此换算；
+        未检测到直线时返回 fallback；estimator 为空时使用直方图峰值。
+        """
+        # 边缘检测
+        with timed_stage("canny"):
+            edges = cv2.Canny(binary, 50, 150, apertureSize=3)
+        
+        # 霍夫直线检测（只累加角度范围内的theta，水平线对应theta=90°）
+        min_theta = max(0.0, np.radians(angle_range[0] + 90))
+        max_theta = min(np.pi, np.radians(angle_range[1] + 90))
+        with timed_stage("hough"):
+            lines = cv2.HoughLines(edges, rho_resolution, theta_resolution, max(1, int(threshold * scale)),
+                                   min_theta=min_theta, max_theta=max_theta)
+        
+        if lines is None:
+            print("Hough transform detected no lines")
+            return DetectionResult.failed(fallback, "standard")
+        
+        # 转换角度并筛选
+        angles = hough_line_angles(lines)
+        angles = angles[(angles >= angle_range[0]) & (angles <= angle_range[1])]
+        
+        if angles.size == 0:
+            print("No lines found in specified range")
+            return DetectionResult.failed(fallback, "standard")
+        
+        # 使用直方图找到最集中的角度
+        peak_angle = aggregate_angles(angles, estimator=estimator or "peak", angle_range=angle_range)
+        
+        print(f"Standard Hough detected {len(angles)} lines")
+        print(f"Most concentrated angle: {peak_angle:.2f}°")
+        
+        return DetectionResult(peak_angle, angle_confidence(angles, None, peak_angle), angles.size,
+                               method="standard")
+    
+    def detect_angle_hough_probabilistic(self, binary, angle_range=(-30, 30), threshold=50, min_line_length=50, max_line_gap=10,
+                                         scale=1.0, fallback=0, estimator=None):
+        """使用概率霍夫变换检测文本行角度"""
+        # 边缘检测
+        with timed_stage("canny"):
+            edges = cv2.Canny(binary, 50, 150, apertureSize=3)
+        
+        # 概率霍夫直线检测（返回线段端点）
+        # 投票阈值和间隙随分辨率换算；最小线段长度保持绝对像素，短线段的角度量化误差过大
+        with timed_stage("hough"):
+            lines = cv2.HoughLinesP(edges, 1, np.pi/180, max(1, int(threshold * scale)), 
+                                   minLineLength=min_line_length, maxLineGap=max_line_gap * scale)
+        
+        if lines is None:
+            print("Probabilistic Hough detected no lines")
+            return DetectionResult.failed(fallback, "probabilistic")
+        
+        # 计算每条线段的角度，线段长度作为权重
+        angles, dx, dy, lengths = segment_geometry(lines)
+        in_range = (angles >= angle_range[0]) & (angles <= angle_range[1])
+        angles = angles[in_range]
+        lengths = lengths[in_range]
+        
+        if angles.size == 0:
+            print("No lines found in specified range")
+            return DetectionResult.failed(fallback, "probabilistic")
+        
+        # 使用加权平均（线段长度作为权重）
+        weighted_angle = aggregate_angles(angles, lengths, estimator or "mean", angle_range)
+        
+        print(f"Probabilistic Hough detected {len(angles)} line segments")
+        print(f"Weighted average angle: {weighted_angle:.2f}°")
+        
+        return DetectionResult(weighted_angle, angle_confidence(angles, lengths, weighted_angle), angles.size,
+                               method="probabilistic")
+    
+    def detect_angle_hough_optimized(self, binary, angle_range=(-30, 30), scale=1.0, fallback=0, estimator=None):
+        """优化版的霍夫变换角度检测"""
+        h, w = binary.shape
+        
+        # 1. 预处理 - 使用形态学操作增强文本行
+        kernel_width = max(1, int(round(5 * scale)))
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width, 1))  # 水平核，增强水平特征
+        with timed_stage("morphology"):
+            enhanced = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+        
+        # 2. 边缘检测
+        with timed_stage("canny"):
+            edges = cv2.Canny(enhanced, 50, 150, apertureSize=3)
+        
+        # 3. 概率霍夫变换，参数根据图像大小自适应
+        min_line_length = max(50 * scale, w * 0.3)  # 最小线段长度为图像宽度的30%
+        threshold = max(50 * scale, w * 0.1)  # 阈值根据图像宽度调整
+        
+        with timed_stage("hough"):
+            lines = cv2.HoughLinesP(edges, 1, np.pi/180, max(1, int(threshold)), 
+                                   minLineLength=int(min_line_length), maxLineGap=20 * scale)
+        
+        if lines is None:
+            print("Hough transform detected no lines, trying lower threshold...")
+            # 降低阈值再次尝试
+            with timed_stage("hough"):
+                lines = cv2.HoughLinesP(edges, 1, np.pi/180, max(1, int(threshold * 0.5)), 
+                                       minLineLength=int(min_line_length * 0.5), maxLineGap=30 * scale)
+            
+            if lines is None:
+                print("Still no lines detected, returning fallback angle")
+                return DetectionResult.failed(fallback, "optimized")
+        
+        # 4. 计算每条线段的角度和权重
+        angles, dx, dy, lengths = segment_geometry(lines)
+        
+        # 去除接近垂直的线段，只保留在指定范围内的角度
+        keep = (np.abs(dx) >= 1) & (angles >= angle_range[0]) & (angles <= angle_range[1])
+        angles = angles[keep]
+        
+        if angles.size == 0:
+            print("No lines found in specified range")
+            return DetectionResult.failed(fallback, "optimized")
+        
+        # 综合权重：长度 + 水平投影
+        weights = lengths[keep] + np.abs(dx[keep]) * 0.5
+        
+        # 5. 使用加权平均
+        weighted_angle = aggregate_angles(angles, weights, estimator or "mean", angle_range)
+        
+        print(f"Optimized Hough detected {len(angles)} line segments")
+        print(f"Weighted average angle: {weighted_angle:.2f}°")
+        
+        return DetectionResult(weighted_angle, angle_confidence(angles, weights, weighted_angle), angles.size,
+                               method="optimized")
+    
+    def detect_angle_projection(self, binary, angle_range=(-30, 30), fallback=0):
+        """投影轮廓法检测文本行角度
+        
+        在缩小的二值图上，对候选角度把文本像素按剪切后的纵坐标做水平投影，
+        投影方差最大的角度即文本行角度；先粗扫描再在最优角度附近细扫描。
+        """
+        small, _ = self.downscale_binary(binary, PROJECTION_SIZE)
+        h, w = small.shape
+        
+        # 文本像素坐标（文本黑色=0）
+        ys, xs = np.nonzero(small == 0)
+        if ys.size < PROJECTION_MIN_PIXELS:
+            print("Projection profile found too few text pixels")
+            return DetectionResult.failed(fallback, "projection")
+        if ys.size > PROJECTION_MAX_PIXELS:
+            sample = np.random.default_rng(0).choice(ys.size, PROJECTION_MAX_PIXELS, replace=False)
+            ys, xs = ys[sample], xs[sample]
+        
+        ys = ys.astype(np.float64)
+        xs = xs.astype(np.float64) - w / 2  # 以图像中心为剪切原点
+        
+        # 所有候选角度共用相同长度的投影，方差可直接比较
+        max_shift = int(np.ceil(w / 2 * np.tan(np.radians(max(abs(angle_range[0]), abs(angle_range[1]))))))
+        profile_length = h + 2 * max_shift + 1
+        
+        def projection_profile(angle):
+            # 文本行 y = y0 + x·tan(angle)，剪切后同一行的像素落在同一投影行
+            rows = np.rint(ys - xs * np.tan(np.radians(angle))).astype(np.int64) + max_shift
+            return np.bincount(rows, minlength=profile_length)
+        
+        def profile_variance(angle):
+            return projection_profile(angle).var()
+        
+        # 1. 粗扫描
+        coarse_angles = np.arange(angle_range[0], angle_range[1] + 1e-9, PROJECTION_COARSE_STEP)
+        with timed_stage("projection"):
+            coarse_scores = [profile_variance(angle) for angle in coarse_angles]
+        best_coarse = coarse_angles[int(np.argmax(coarse_scores))]
+        
+        # 2. 细扫描
+        fine_angles = np.arange(
+            max(angle_range[0], best_coarse - PROJECTION_COARSE_STEP),
+            min(angle_range[1], best_coarse + PROJECTION_COARSE_STEP) + 1e-9,
+            PROJECTION_FINE_STEP
+        )
+        with timed_stage("projection"):
+            fine_scores = np.array([profile_variance(angle) for angle in fine_angles])
+        best = int(np.argmax(fine_scores))
+        best_angle = float(fine_angles[best])
+        
+        # 抛物线插值得到步长以下的精度
+        if 0 < best < len(fine_scores) - 1:
+            left, center, right = fine_scores[best - 1], fine_scores[best], fine_scores[best + 1]
+            denominator = left - 2 * center + right
+            if denominator != 0:
+                best_angle += float(np.clip(0.5 * (left - right) / denominator, -0.5, 0.5)) * PROJECTION_FINE_STEP
+        
+        # 置信度：最优角度的投影方差相对各候选角度典型方差的突出程度
+        confidence = 1.0 - float(np.median(coarse_scores)) / max(float(fine_scores[best]), 1e-9)
+        # 文本行数量：最优角度投影中高于平均值的连续区段数
+        above = projection_profile(best_angle) > ys.size / profile_length
+        line_count = int(np.count_nonzero(above[1:] & ~above[:-1]))
+        
+        print(f"Projection profile used {ys.size} text pixels at {w}x{h}")
+        print(f"Max variance angle: {best_angle:.2f}°")
+        
+        return DetectionResult(best_angle, max(0.0, confidence), line_count, method="projection")
+    
+    def detect_angle_fourier(self, binary, angle_range=(-30, 30), fallback=0):
+        """频谱法检测文本行角度
+        
+        对缩小并加窗的文本图做二维傅里叶变换，平行文本行的能量集中在与行垂直的方向上，
+        统计各方向的平均幅度，峰值方向减去90°即文本行角度。耗时与直线数量无关。
+        """
+        small, _ = self.downscale_binary(binary, FOURIER_SIZE)
+        h, w = small.shape
+        
+        # 文本像素=1，去均值并加汉宁窗抑制页面边界造成的十字形频谱
+        ink = (small == 0).astype(np.float32)
+        if ink.sum() < PROJECTION_MIN_PIXELS:
+            print("Fourier spectrum found too few text pixels")
+            return DetectionResult.failed(fallback, "fourier")
+        ink -= ink.mean()
+        ink *= np.outer(np.hanning(h), np.hanning(w)).astype(np.float32)
+        
+        # 实数输入的频谱中心对称，只需计算半平面
+        with timed_stage("fft"):
+            magnitude = np.abs(np.fft.rfft2(ink))
+        fy = np.fft.fftfreq(h)[:, None]
+        fx = np.fft.rfftfreq(w)[None, :]
+        radius = np.hypot(fx, fy)
+        
+        # 频率方向（折叠到[0, 180)）减去90°即对应的文本行角度
+        angles = np.degrees(np.arctan2(np.broadcast_to(fy, radius.shape), 
+                                       np.broadcast_to(fx, radius.shape))) % 180 - 90
+        mask = ((radius >= FOURIER_MIN_FREQUENCY) & (radius <= FOURIER_MAX_FREQUENCY) & 
+                (angles >= angle_range[0]) & (angles <= angle_range[1]))
+        
+        # 角向能量分布：每个角度分箱内的平均幅度（消除像素网格造成的分箱样本数差异）
+        bin_count = int(round((angle_range[1] - angle_range[0]) / FOURIER_ANGLE_STEP)) + 1
+        bins = np.rint((angles[mask] - angle_range[0]) / FOURIER_ANGLE_STEP).astype(np.int64)
+        energy = np.bincount(bins, weights=magnitude[mask], minlength=bin_count)
+        samples = np.bincount(bins, minlength=bin_count)
+        profile = np.divide(energy, samples, out=np.zeros(bin_count), where=samples > 0)
+        profile = np.convolve(profile, np.ones(3) / 3, mode='same')  # 轻度平滑
+        
+        best = int(np.argmax(profile))
+        offset = 0.0
+        if 0 < best < bin_count - 1:
+            left, center, right = profile[best - 1], profile[best], profile[best + 1]
+            denominator = left - 2 * center + right
+            if denominator != 0:
+                offset = float(np.clip(0.5 * (left - right) / denominator, -0.5, 0.5))
+        best_angle = angle_range[0] + (best + offset) * FOURIER_ANGLE_STEP
+        
+        # 置信度：峰值相对典型幅度的突出程度，并按峰值窗口外的次高峰（插图、表格线等）折减
+        prominence = profile - np.median(profile)
+        outside = np.abs(np.arange(bin_count) - best) * FOURIER_ANGLE_STEP > CONFIDENCE_TOLERANCE
+        second = float(prominence[outside].max()) if np.any(outside) else 0.0
+        confidence = ((1.0 - float(np.median(profile)) / max(float(profile[best]), 1e-9)) *
+                      (1.0 - max(0.0, second) / max(float(prominence[best]), 1e-9)))
+        
+        print(f"Fourier spectrum analysed at {w}x{h}")
+        print(f"Dominant orientation angle: {best_angle:.2f}°")
+        
+        return DetectionResult(best_angle, max(0.0, confidence), method="fourier")
+    
+    def detect_angle_tiles(self, binary, angle_range=(-30, 30), scale=1.0, fallback=0):
+        """分块投票法检测文本行角度
+        
+        按墨迹密度图挑选文字密集的分块（跳过空白边距和图片、照片），在线程池中
+        分别用优化霍夫变换检测每块的角度，再取相互一致的分块最多的一组的平均值。
+        """
+        small, tile_scale = self.downscale_binary(binary, TILE_WORK_SIZE)
+        scale *= tile_scale
+        h, w = small.shape
+        tile = max(1, min(max(h, w) // TILE_GRID, h, w))
+        rows, cols = h // tile, w // tile
+        
+        # 1. 墨迹密度图：区域插值缩小到每块一个像素即为该块的文本像素比例
+        ink = (small[:rows * tile, :cols * tile] == 0).astype(np.float32)
+        density = cv2.resize(ink, (cols, rows), interpolation=cv2.INTER_AREA).ravel()
+        
+        # 2. 选取密度在文本范围内且最密集的若干分块
+        candidates = np.flatnonzero((density >= TILE_MIN_INK) & (density <= TILE_MAX_INK))
+        if candidates.size == 0:
+            print("No text-dense tiles found, detecting on the whole page")
+            result = self.detect_angle_hough_optimized(small, angle_range, scale=scale, fallback=fallback)
+            result.method = "tiles"
+            return result
+        order = candidates[np.argsort(density[candidates])[::-1]][:TILE_COUNT]
+        tiles = [small[(i // cols) * tile:(i // cols + 1) * tile, (i % cols) * tile:(i % cols + 1) * tile]
+                 for i in order]
+        
+        # 3. 并行检测各分块角度（OpenCV 计算时释放 GIL）
+        image_name = current_timing_image()
+        
+        def detect_tile(tile_binary):
+            with timing_image(image_name):
+                return self.detect_angle_hough_optimized(tile_binary, angle_range, scale=scale, fallback=None,
+                                                         estimator=self.angle_estimator or "trimmed")
+        
+        with ThreadPoolExecutor(max_workers=min(len(tiles), os.cpu_count() or 1)) as executor:
+            estimates = list(executor.map(detect_tile, tiles))
+        estimates = [estimate for estimate in estimates if not estimate.fallback]
+        if not estimates:
+            print("No lines detected in any tile, returning fallback angle")
+            return DetectionResult.failed(fallback, "tiles")
+        angles = np.array([estimate.angle for estimate in estimates])
+        
+        # 4. 稳健投票：容差内相互一致的分块最多的角度胜出，对该组分块取平均
+        agree = np.abs(angles[:, None] - angles[None, :]) <= TILE_VOTE_TOLERANCE
+        winners = agree[int(np.argmax(agree.sum(axis=1)))]
+        inliers = angles[winners]
+        tile_angle = float(inliers.mean())
+        
+        # 置信度：一致分块占所选分块的比例 × 一致分块的平均置信度
+        inlier_estimates = [estimate for estimate, win in zip(estimates, winners) if win]
+        confidence = (inliers.size / len(tiles)) * float(np.mean([e.confidence for e in inlier_estimates]))
+        line_count = sum(estimate.line_count for estimate in inlier_estimates)
+        
+        print(f"Tile consensus: {inliers.size}/{angles.size} tiles agree (of {rows * cols} tiles)")
+        print(f"Consensus angle: {tile_angle:.2f}°")
+        
+        return DetectionResult(tile_angle, confidence, line_count, method="tiles")
+    
+    def detect_angle_cascade(self, binary, angle_range=(-30, 30), scale=1.0):
+        """级联检测：按由快到慢的顺序尝试各方法，置信度达到阈值即停止，否则取置信度最高的结果"""
+        best = None
+        seconds = 0.0
+        for method in CASCADE_METHODS:
+            result = self.detect_page(binary, angle_range, method, scale)
+            seconds += result.seconds
+            if best is None or result.confidence > best.confidence:
+                best = result
+            if result.confidence >= CASCADE_MIN_CONFIDENCE:
+                print(f"Cascade stopped at {method} (confidence {result.confidence:.2f})")
+                break
+        else:
+            print(f"Cascade exhausted, using {best.method} (confidence {best.confidence:.2f})")
+        
+        best.seconds = seconds
+        return best
+    
+    def detect_angle(self, binary, angle_range=(-30, 30), scale=1.0, fallback=0, method=None):
+        """按检测方法（默认为当前方法）在给定分辨率上检测角度，返回 DetectionResult"""
+        method = method or self.hough_method
+        start_time = time.perf_counter()
+        
+        if method == "projection":
+            result = self.detect_angle_projection(binary, angle_range, fallback=fallback)
+        elif method == "fourier":
+            result = self.detect_angle_fourier(binary, angle_range, fallback=fallback)
+        elif method == "tiles":
+            result = self.detect_angle_tiles(binary, angle_range, scale=scale, fallback=fallback)
+        else:
+            options = dict(scale=scale, fallback=fallback, estimator=self.angle_estimator)
+            if method == "standard":
+                result = self.detect_angle_hough(binary, angle_range, **options)
+            elif method == "probabilistic":
+                result = self.detect_angle_hough_probabilistic(binary, angle_range, **options)
+            else:  # optimized
+                result = self.detect_angle_hough_optimized(binary, angle_range, **options)
+        
+        result.seconds = time.perf_counter() - start_time
+        return result
+    
+    def detect_page(self, binary, angle_range=(-30, 30), method=None, scale=1.0):
+        """在整页二值图上检测：大图的霍夫方法使用多分辨率检测，投影法、频谱法和分块法自行缩小
+        
+        scale 为 binary 相对原图的缩放比例（输入已缩小解码时小于1）。
+        """
+        method = method or self.hough_method
+        if method == "cascade":
+            return self.detect_angle_cascade(binary, angle_range, scale)
+        
+        h, w = binary.shape
+        if self.use_pyramid and method not in SELF_SCALING_METHODS and max(h, w) / scale > PYRAMID_MIN_SIZE:
+            return self.detect_angle_pyramid(binary, angle_range, method, scale)
+        return self.detect_angle(binary, angle_range, scale=scale, method=method)
+    
+    def downscale_binary(self, binary, max_size):
+        """将二值图缩小到长边不超过 max_size，返回 (缩小后的二值图, 缩放比例)"""
+        h, w = binary.shape
+        scale = min(1.0, max_size / max(h, w))
+        if scale >= 1.0:
+            return binary, 1.0
+        
+        small = cv2.resize(binary, (max(1, int(w * scale)), max(1, int(h * scale))), 
+                           interpolation=cv2.INTER_AREA)
+        # 区域插值会产生灰度，重新二值化保持背景白色、文本黑色
+        _, small = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return small, scale
+    
+    def detect_angle_pyramid(self, binary, angle_range=(-30, 30), method=None, scale=1.0):
+        """由粗到精的多分辨率角度检测：先在缩略层估计，再在较高分辨率的窄窗口内精化"""
+        method = method or self.hough_method
+        start_time = time.perf_counter()
+        
+        # 1. 粗检测
+        coarse, coarse_scale = self.downscale_binary(binary, PYRAMID_COARSE_SIZE)
+        coarse_result = self.detect_angle(coarse, angle_range, scale=coarse_scale * scale, method=method)
+        coarse_angle = coarse_result.angle
+        print(f"Pyramid coarse angle ({coarse.shape[1]}x{coarse.shape[0]}): {coarse_angle:.2f}°")
+        
+        # 2. 精检测：只在粗检测角度附近的窗口内搜索，找不到直线时沿用粗检测结果；
+        #    粗检测层没有找到直线时（角度只是回退值）在完整角度范围内搜索
+        fine, fine_scale = self.downscale_binary(binary, PYRAMID_FINE_SIZE)
+        if coarse_result.fallback:
+            result = self.detect_angle(fine, angle_range, scale=fine_scale * scale, fallback=coarse_angle,
+                                       method=method)
+        else:
+            refine_range = (
+                max(angle_range[0], coarse_angle - PYRAMID_REFINE_WINDOW),
+                min(angle_range[1], coarse_angle + PYRAMID_REFINE_WINDOW)
+            )
+            if method == "standard":
+                # 窗口很窄，标准霍夫改用更细的角度步长
+                result = self.detect_angle_hough(fine, refine_range, theta_resolution=PYRAMID_REFINE_THETA,
+                                                 scale=fine_scale * scale, fallback=coarse_angle,
+                                                 estimator=self.angle_estimator)
+            else:
+                result = self.detect_angle(fine, refine_range, scale=fine_scale * scale, fallback=coarse_angle,
+                                           method=method)
+        if result.fallback:
+            result = coarse_result  # 沿用粗检测结果及其置信度
+        print(f"Pyramid refined angle ({fine.shape[1]}x{fine.shape[0]}): {result.angle:.2f}°")
+        
+        result.seconds = time.perf_counter() - start_time
+        return result
+    
+    def calculate_rotation_angle_by_two_points(self, point1, point2):
+        """完全按照您提供的两点法计算旋转角度"""
+        x1, y1 = point1
+        x2, y2 = point2
+        
+        # 计算两点距离
+        dx = x2 - x1
+        dy = y2 - y1
+        
+        # 计算直线与水平线的夹角
+        angle_rad = math.atan2(dy, dx)
+        angle_deg = math.degrees(angle_rad)
+        
+        # 判断是水平矫正还是垂直矫正
+        if abs(dx) > abs(dy):  # 横向距离大于纵向距离 - 水平矫正
+            target_angle = angle_deg
+        else:  # 纵向距离大于横向距离 - 垂直矫正
+            if x1 > x2:  # 上点更靠右
+                target_angle = -(90 - angle_deg)
+            else:  # 下点更靠右
+                target_angle = -(90 - angle_deg)
+        
+        return target_angle
+    
+    def set_hough_method(self, method):
+        """设置霍夫变换方法"""
+        if method in HOUGH_METHODS:
+            self.hough_method = method
+            print(f"Switched to {method} Hough method")
+        else:
+            print(f"Invalid Hough method: {method}")
+    
+    def cache_params(self, scale=1.0):
+        """影响检测结果的参数，作为角度缓存键的一部分"""
+        return json.dumps({
+            'version': ANGLE_CACHE_VERSION,
+            'pyramid': self.use_pyramid,
+            'estimator': self.angle_estimator,
+            'scale': round(scale, 6)
+        }, sort_keys=True)
+    
+    @property
+    def reduces_input(self):
+        """检测能否在缩小的图片上进行：多分辨率检测和自行缩小的方法最高只用到 DETECTION_MAX_SIZE"""
+        return self.use_pyramid or self.hough_method in SELF_SCALING_METHODS
+    
+    def prepare_detection_image(self, pil_image, scale=1.0):
+        """转为检测用的灰度图，返回 (灰度图, 相对原图的缩放比例)
+        
+        可以缩小时先按整数倍缩小再转灰度，避免构造全尺寸的彩色数组和灰度副本。
+        """
+        if self.reduces_input:
+            factor = max(pil_image.size) // DETECTION_MAX_SIZE
+            if factor >= 2:
+                if pil_image.mode not in REDUCIBLE_MODES:
+                    pil_image = reduce_to_gray(pil_image, factor)
+                else:
+                    pil_image = pil_image.reduce(factor)
+                scale /= factor
+        if pil_image.mode != 'L':
+            pil_image = pil_image.convert('L')
+        return pil_image, scale
+    
+    def analyze_image(self, pil_image, scale=1.0):
+        """检测单张图片的倾斜，返回 DetectionResult（rotation_angle 为应旋转的角度）
+        
+        pil_image 可以是已缩小解码的图片（见 open_detection_image），scale 为其相对原图的比例。
+        """
+        try:
+            w, h = pil_image.size
+            gray, scale = self.prepare_detection_image(pil_image, scale)
+            
+            # 0. 查询持久化缓存，检测输入与参数均未变化时跳过检测
+            cached = None
+            if self.angle_cache is not None:
+                content_hash = image_content_hash(gray)
+                params = self.cache_params(scale)
+                cached = self.angle_cache.get(content_hash, self.hough_method, params)
+            
+            if cached is not None:
+                result = DetectionResult.from_dict(cached[2])
+                print(f"Angle cache hit: {result.angle:.2f}°")
+            else:
+                # 1. 预处理图像
+                binary = self.preprocess_image(gray)
+                
+                # 2. 检测角度
+                result = self.detect_page(binary, scale=scale)
+            method_name = {
+                "standard": "Standard Hough",
+                "probabilistic": "Probabilistic Hough",
+                "projection": "Projection profile",
+                "fourier": "Fourier spectrum",
+                "tiles": "Tile consensus"
+            }.get(result.method, "Optimized Hough")
+            
+            print(f"{method_name} detected angle: {result.angle:.2f}° "
+                  f"(confidence {result.confidence:.2f}, {result.line_count} lines, {result.seconds:.3f}s)")
+            
+            # 3. 使用两点法计算旋转角度
+            center_x, center_y = w // 2, h // 2
+            distance = min(w, h) // 4
+            
+            angle_rad = math.radians(result.angle)
+            # 使用浮点坐标，避免取整损失检测精度
+            point1 = (
+                center_x - distance * math.cos(angle_rad),
+                center_y - distance * math.sin(angle_rad)
+            )
+            point2 = (
+                center_x + distance * math.cos(angle_rad),
+                center_y + distance * math.sin(angle_rad)
+            )
+            
+            result.rotation_angle = self.calculate_rotation_angle_by_two_points(point1, point2)
+            print(f"Two-point method calculated rotation angle: {result.rotation_angle:.2f}°")
+            
+            if self.angle_cache is not None and cached is None:
+                self.angle_cache.put(content_hash, self.hough_method, params,
+                                     result.angle, result.rotation_angle, result.to_dict())
+            
+            return result
+            
+        except Exception as e:
+            print(f"Error in auto-deskewion: {e}")
+            import traceback
+            traceback.print_exc()
+            result = DetectionResult.failed(0, self.hough_method)
+            result.rotation_angle = 0.0
+            return result
+    
+    def auto_deskew_image(self, pil_image):
+        """自动纠偏单张图片，返回应旋转的角度"""
+        return self.analyze_image(pil_image).rotation_angle
+
+
+def open_detection_image(path, max_size=DETECTION_MAX_SIZE):
+    """只为检测解码图片：JPEG 通过 DCT 缩放直接解码出不小于 max_size 的灰度小图
+    
+    返回 (图片, 相对原图的缩放比例)；其他格式完整解码，由 prepare_detection_image 再缩小。
+    """
+    with timed_stage("decode") as info:
+        image = Image.open(path)
+        full_size = max(image.size)
+        factor = full_size // max_size
+        if factor >= 2:
+            image.draft('L', (-(-image.size[0] // factor), -(-image.size[1] // factor)))
+        image.load()
+        info['bytes'] = os.path.getsize(path)
+    return image, max(image.size) / full_size
+
+
+def reduce_to_gray(image, factor, band_rows=256):
+    """按整数倍缩小为灰度图：逐条（每条 factor × band_rows 行）转灰度再缩小，不生成全尺寸的灰度副本
+    
+    各条按 factor 的整数倍对齐，结果与整幅 convert('L').reduce(factor) 一致。
+    """
+    width, height = image.size
+    reduced = Image.new('L', (-(-width // factor), -(-height // factor)))
+    step = factor * band_rows
+    for top in range(0, height, step):
+        band = image.crop((0, top, width, min(height, top + step))).convert('L')
+        reduced.paste(band.reduce(factor), (0, top // factor))
+    return reduced
+
+
+def has_alpha_channel(image):
+    """检查图片是否有透明通道"""
+    return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def rotate_image(image, angle, bg_color=DEFAULT_BG_COLOR, backend=DEFAULT_ROTATION_BACKEND, resample="bicubic"):
+    """旋转图片（扩展画布），透明图片使用透明背景，其余使用填充色
+    
+    backend 为 "opencv" 时用多线程的 cv2.warpAffine，"pil" 时用 Image.rotate（单线程）；
+    resample 为 "bicubic" 或 "lanczos"（PIL 不支持 Lanczos 旋转，按双三次处理）。
+    90 度整数倍的旋转始终由 PIL 无损转置完成。
+    """
+    if backend == "opencv" and angle % 90 != 0:
+        return rotate_to_size(image, angle, expanded_size(image.size, angle), bg_color, backend, resample)
+    
+    # 检查是否有透明通道
+    if has_alpha_channel(image):
+        # 透明图片：使用透明背景旋转
+        fillcolor = None
+    else:
+        # 非透明图片：使用设置的背景色
+        fillcolor = pil_fill_color(image.mode, bg_color)
+    
+    with timed_stage("rotate") as info:
+        rotated = image.rotate(
+            angle, 
+            expand=True, 
+            resample=Image.BICUBIC,
+            fillcolor=fillcolor
+        )
+        info['bytes'] = image_nbytes(rotated)
+    return rotated
+
+
+def expanded_size(size, angle):
+    """旋转后能容纳整张图片的画布尺寸（与 Image.rotate(expand=True) 的计算一致）"""
+    width, height = size
+    radians = -math.radians(angle)
+    cos_a, sin_a = round(math.cos(radians), 15), round(math.sin(radians), 15)
+    center_x, center_y = width / 2, height / 2
+    xs, ys = [], []
+    for x, y in ((0, 0), (width, 0), (width, height), (0, height)):
+        # 绕中心旋转角点
+        xs.append(cos_a * (x - center_x) + sin_a * (y - center_y) + center_x)
+        ys.append(-sin_a * (x - center_x) + cos_a * (y - center_y) + center_y)
+    return (math.ceil(max(xs)) - math.floor(min(xs)), math.ceil(max(ys)) - math.floor(min(ys)))
+
+
+def fill_value(mode, bg_color=DEFAULT_BG_COLOR):
+    """旋转后空白区域的填充值：透明图片填充全透明，单通道图片按亮度换算填充色"""
+    if mode in ('RGBA', 'LA'):
+        return (0, 0, 0, 0)
+    if mode in ('L', '1', 'I', 'F', 'I;16'):
+        # 与 PIL 的 RGB → L 换算一致，1 位图片取黑或白
+        red, green, blue = bg_color
+        luminance = (red * 299 + green * 587 + blue * 114) // 1000
+        if mode == '1':
+            return 255 if luminance >= 128 else 0
+        return luminance
+    return tuple(bg_color)
+
+
+def pil_fill_color(mode, bg_color=DEFAULT_BG_COLOR):
+    """PIL 旋转的 fillcolor：1 位、16 位和浮点灰度图片只接受单值填充色"""
+    if mode != 'P' and Image.getmodebands(mode) == 1:
+        return fill_value(mode, bg_color)
+    return bg_color
+
+
+def palette_fill_index(image, bg_color=DEFAULT_BG_COLOR):
+    """调色板图片的填充索引：有透明色时用透明索引，否则取调色板中与填充色最接近的颜色"""
+    transparency = image.info.get('transparency')
+    if isinstance(transparency, int):
+        return transparency
+    palette = np.asarray(image.getpalette() or [0, 0, 0], dtype=np.int32).reshape(-1, 3)
+    return int(np.argmin(((palette - np.asarray(bg_color[:3])) ** 2).sum(axis=1)))
+
+
+def warp_with_opencv(image, angle, size, bg_color=DEFAULT_BG_COLOR, resample="bicubic"):
+    """用 cv2.warpAffine 旋转到指定尺寸，不支持的模式返回 None
+    
+    调色板图片按索引最近邻采样（保持调色板不变），1 位图片按灰度插值后再二值化。
+    """
+    if image.mode not in OPENCV_ROTATE_MODES:
+        return None
+    width, height = image.size
+    output_width, output_height = size
+    # 绕图片中心旋转，再平移到输出图像中心（OpenCV 以像素中心为整数坐标）
+    matrix = cv2.getRotationMatrix2D(((width - 1) / 2, (height - 1) / 2), angle, 1.0)
+    matrix[0, 2] += (output_width - width) / 2
+    matrix[1, 2] += (output_height - height) / 2
+    
+    if image.mode == 'P':
+        interpolation = cv2.INTER_NEAREST
+        border = palette_fill_index(image, bg_color)
+        pixels = np.asarray(image)
+    elif image.mode == '1':
+        interpolation = RESAMPLE_FILTERS[resample]
+        border = fill_value('1', bg_color)
+        pixels = np.asarray(image.convert('L'))
+    else:
+        interpolation = RESAMPLE_FILTERS[resample]
+        border = fill_value(image.mode, bg_color)
+        pixels = np.asarray(image)
+    
+    pixels = cv2.warpAffine(
+        pixels, matrix, (output_width, output_height),
+        flags=interpolation,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=border
+    )
+    if image.mode == '1':
+        return Image.fromarray(pixels >= 128)
+    if image.mode == 'P':
+        rotated = Image.frombytes('P', size, pixels.tobytes())
+        rotated.putpalette(image.getpalette())
+        return rotated
+    return Image.fromarray(pixels)
+
+
+def rotate_to_size(image, angle, size, bg_color=DEFAULT_BG_COLOR, backend=DEFAULT_ROTATION_BACKEND,
+                   resample="bicubic"):
+    """旋转并居中裁切到指定尺寸（尺寸锁定时使用）
+    
+    一次仿射变换直接写入目标尺寸的图像，不生成扩展画布再裁切，
+    结果与 rotate_image + crop_to_size 一致（仅有亚像素差异）。
+    OpenCV 不支持的模式（CMYK、32 位整数等）或 backend 为 "pil" 时使用 PIL 的仿射变换。
+    """
+    width, height = size
+    
+    with timed_stage("rotate") as info:
+        rotated = None
+        if backend == "opencv":
+            rotated = warp_with_opencv(image, angle, size, bg_color, resample)
+        if rotated is None:
+            # PIL 的仿射变换需要输出 → 输入的逆矩阵
+            radians = math.radians(angle)
+            cos_a, sin_a = math.cos(radians), math.sin(radians)
+            center_x, center_y = image.size[0] / 2, image.size[1] / 2
+            output_center_x, output_center_y = width / 2, height / 2
+            data = (
+                cos_a, -sin_a, center_x - cos_a * output_center_x + sin_a * output_center_y,
+                sin_a, cos_a, center_y - sin_a * output_center_x - cos_a * output_center_y
+            )
+            fillcolor = None if has_alpha_channel(image) else pil_fill_color(image.mode, bg_color)
+            rotated = image.transform(size, Image.AFFINE, data, resample=Image.BICUBIC, fillcolor=fillcolor)
+        rotated.info.update(image.info)
+        info['bytes'] = image_nbytes(rotated)
+    return rotated
+
+
+def crop_to_size(image, size, bg_color=DEFAULT_BG_COLOR):
+    """将图片居中裁切回指定尺寸，不足部分使用填充色补齐"""
+    with timed_stage("crop"):
+        original_width, original_height = size
+        current_width, current_height = image.size
+        
+        # 计算裁切区域（居中裁切）
+        left = (current_width - original_width) // 2
+        top = (current_height - original_height) // 2
+        right = left + original_width
+        bottom = top + original_height
+        
+        # 确保裁切区域在图片范围内
+        left = max(0, left)
+        top = max(0, top)
+        right = min(current_width, right)
+        bottom = min(current_height, bottom)
+        
+        # 如果裁切区域小于原始尺寸，需要填充
+        if (right - left) < original_width or (bottom - top) < original_height:
+            # 创建新图片并填充背景色
+            new_image = Image.new('RGB', size, bg_color)
+            # 将裁切的部分粘贴到新图片中
+            paste_x = (original_width - (right - left)) // 2
+            paste_y = (original_height - (bottom - top)) // 2
+            cropped = image.crop((left, top, right, bottom))
+            new_image.paste(cropped, (paste_x, paste_y))
+            return new_image
+        else:
+            # 直接裁切
+            return image.crop((left, top, right, bottom))
+
+
+# ---- 分条处理（超大图片） ----
+
+def needs_strip_processing(image, memory_budget=STRIP_MEMORY_BUDGET):
+    """整幅旋转时的工作内存（旋转结果及编码副本）是否会超过上限"""
+    return bool(memory_budget) and 2 * image_nbytes(image) > memory_budget
+
+
+def strip_rows(image, angle, size, memory_budget=STRIP_MEMORY_BUDGET):
+    """每条的行数：输出条、滤波后的副本、压缩数据和条对应的原图区域都计入工作内存
+
+    k 行输出对应的原图区域约为 k·cos + 输出宽度·sin 行（区域截取和转数组各一份），
+    角度较大时原图区域占用的内存与条高无关，此时取最小条高。
+    """
+    bands = Image.getmodebands(image.mode)
+    radians = math.radians(angle)
+    sin_a, cos_a = abs(math.sin(radians)), abs(math.cos(radians))
+    source_row = bands * image.width
+    per_row = 3 * bands * size[0] + 2 * cos_a * source_row
+    fixed = 2 * source_row * (size[0] * sin_a + 2 * STRIP_MARGIN)
+    rows = int((memory_budget - fixed) // per_row)
+    return max(STRIP_MIN_ROWS, min(rows, size[1]))
+
+
+def rotated_strips(image, angle, size, bg_color=DEFAULT_BG_COLOR, resample="bicubic", rows=STRIP_MIN_ROWS):
+    """按条生成旋转结果（与 rotate_to_size 的几何一致），每次只截取该块需要的原图区域
+
+    生成 uint8 数组：多通道为 (行, 宽, 通道)，L 为 (行, 宽)，1 位图片为布尔数组。
+    """
+    width, height = image.size
+    output_width, output_height = size
+    matrix = cv2.getRotationMatrix2D(((width - 1) / 2, (height - 1) / 2), angle, 1.0)
+    matrix[0, 2] += (output_width - width) / 2
+    matrix[1, 2] += (output_height - height) / 2
+    inverse = cv2.invertAffineTransform(matrix)
+    border = fill_value(image.mode, bg_color)
+    bands = Image.getmodebands(image.mode)
+    shape = (output_width,) if bands == 1 else (output_width, bands)
+
+    for top in range(0, output_height, rows):
+        count = min(rows, output_height - top)
+        strip = np.empty((count,) + shape, dtype=np.uint8)
+        for left in range(0, output_width, STRIP_TILE_WIDTH):
+            tile_width = min(STRIP_TILE_WIDTH, output_width - left)
+            # 块的四个角逆变换到原图，外接矩形加上插值核边距即为需要的原图区域
+            corners = np.array([[left, top], [left + tile_width - 1, top],
+                                [left, top + count - 1], [left + tile_width - 1, top + count - 1]], dtype=np.float64)
+            source = corners @ inverse[:, :2].T + inverse[:, 2]
+            x0 = max(0, math.floor(source[:, 0].min()) - STRIP_MARGIN)
+            y0 = max(0, math.floor(source[:, 1].min()) - STRIP_MARGIN)
+            x1 = min(width, math.ceil(source[:, 0].max()) + STRIP_MARGIN + 1)
+            y1 = min(height, math.ceil(source[:, 1].max()) + STRIP_MARGIN + 1)
+            target = strip[:, left:left + tile_width]
+            if x0 >= x1 or y0 >= y1:
+                # 块完全落在原图之外
+                target[...] = border
+                continue
+
+            region = image.crop((x0, y0, x1, y1))
+            pixels = np.asarray(region.convert('L') if image.mode == '1' else region)
+            # 区域坐标 → 块坐标：平移量加上区域原点的变换，再减去块的左上角
+            tile_matrix = matrix.copy()
+            tile_matrix[:, 2] += matrix[:, :2] @ (x0, y0) - (left, top)
+            target[...] = cv2.warpAffine(
+                pixels, tile_matrix, (tile_width, count),
+                flags=RESAMPLE_FILTERS[resample],
+                borderMode=cv2.BORDER_CONSTANT,
+                borderValue=border
+            )
+        yield strip >= 128 if image.mode == '1' else strip
+
+
+def strip_scanlines(strip, mode):
+    """条数组 → 每行一段字节的二维数组（1 位图片按位打包）"""
+    if mode == '1':
+        return np.packbits(strip, axis=1)
+    return strip.reshape(strip.shape[0], -1)
+
+
+class PngStripWriter:
+    """逐条写入 PNG：各行按 Up 滤波后送入流式 zlib 压缩，每条写成 IDAT 块"""
+
+    FORMATS = {'1': (1, 0), 'L': (8, 0), 'LA': (8, 4), 'RGB': (8, 2), 'RGBA': (8, 6)}  # 模式 -> (位深, 颜色类型)
+
+    def __init__(self, file, size, mode, compress_level=6, icc_profile=None):
+        bit_depth, color_type = self.FORMATS[mode]
+        self.file = file
+        self.mode = mode
+        self.compressor = zlib.compressobj(compress_level)
+        self.previous_row = None
+        file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', size[0], size[1], bit_depth, color_type, 0, 0, 0))
+        if icc_profile:
+            self._chunk(b'iCCP', b'ICC Profile\x00\x00' + zlib.compress(icc_profile))
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack('>I', len(data)) + kind + data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+    def write(self, strip):
+        scanlines = strip_scanlines(strip, self.mode)
+        above = np.empty_like(scanlines)
+        above[0] = 0 if self.previous_row is None else self.previous_row
+        above[1:] = scanlines[:-1]
+        filtered = np.empty((scanlines.shape[0], scanlines.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2  # 滤波类型 Up：与上一行逐字节相减（按 256 取模）
+        np.subtract(scanlines, above, out=filtered[:, 1:])
+        self.previous_row = scanlines[-1].copy()
+        data = self.compressor.compress(filtered)
+        if data:
+            self._chunk(b'IDAT', data)
+
+    def finish(self):
+        self._chunk(b'IDAT', self.compressor.flush())
+        self._chunk(b'IEND', b'')
+
+
+class TiffStripWriter:
+    """逐条写入 TIFF，写完后在文件末尾写入 IFD
+
+    Deflate 压缩时每条直接用 zlib 压缩（8 位图片带水平差分预测）；其他压缩方式（LZW、1 位图片的
+    CCITT Group 4 等）由 PIL 把每条编码为单条 TIFF，再取出其中压缩后的条数据，TIFF 各条独立编码。
+    rows 为每条行数（除最后一条外必须一致）；文件超过 4 GiB 时无法写入经典 TIFF。
+    """
+
+    DEFLATE_COMPRESSIONS = ("tiff_deflate", "tiff_adobe_deflate")  # 直接用 zlib 写入的 PIL 压缩方式名称
+
+    def __init__(self, file, size, mode, rows, compression="tiff_adobe_deflate", compress_level=6,
+                 icc_profile=None):
+        self.file = file
+        self.size = size
+        self.mode = mode
+        self.rows = rows
+        self.compression = compression
+        self.compress_level = compress_level
+        self.icc_profile = icc_profile
+        self.bands = Image.getmodebands(mode)
+        # 压缩方式、光度解释、预测器，PIL 编码时取自其输出
+        self.codec_tags = {
+            259: [8],  # Adobe Deflate
+            262: [2 if mode in ('RGB', 'RGBA') else 1],  # RGB / 0 为黑
+            317: [1 if mode == '1' else 2]
+        }
+        self.offsets = []
+        self.byte_counts = []
+        file.write(b'II*\x00' + struct.pack('<I', 0))  # IFD 偏移在 finish 中回填
+
+    def write(self, strip):
+        if self.compression in self.DEFLATE_COMPRESSIONS:
+            data = self._deflate(strip)
+        else:
+            data = self._encode_with_pil(strip)
+        self.offsets.append(self.file.tell())
+        self.byte_counts.append(len(data))
+        self.file.write(data)
+
+    def _deflate(self, strip):
+        scanlines = strip_scanlines(strip, self.mode)
+        if self.mode != '1':
+            # 水平差分预测：每个样本减去同一通道左侧的样本
+            pixels = scanlines.reshape(scanlines.shape[0], -1, self.bands)
+            predicted = pixels.copy()
+            np.subtract(pixels[:, 1:], pixels[:, :-1], out=predicted[:, 1:])
+            scanlines = predicted
+        return zlib.compress(scanlines, self.compress_level)
+
+    def _encode_with_pil(self, strip):
+        buffer = io.BytesIO()
+        Image.fromarray(strip).save(buffer, format="TIFF", compression=self.compression,
+                                    tiffinfo={278: strip.shape[0]})
+        buffer.seek(0)
+        with Image.open(buffer) as encoded:
+            tags = encoded.tag_v2
+            (offset,), (count,) = tags[273], tags[279]
+            self.codec_tags = {tag: [tags[tag]] for tag in (259, 262, 317) if tag in tags}
+            self.codec_tags.setdefault(317, [1])
+        return buffer.getbuffer()[offset:offset + count].tobytes()
+
+    def finish(self):
+        file = self.file
+        if file.tell() % 2:
+            file.write(b'\x00')
+        ifd_offset = file.tell()
+        if ifd_offset >= 2 ** 32:
+            raise ValueError("TIFF output exceeds 4 GiB")
+
+        short, long, undefined = 3, 4, 7
+        bits = 1 if self.mode == '1' else 8
+        tags = [
+            (256, long, [self.size[0]]),
+            (257, long, [self.size[1]]),
+            (258, short, [bits] * self.bands),
+            (259, short, self.codec_tags[259]),
+            (262, short, self.codec_tags[262]),
+            (273, long, self.offsets),
+            (277, short, [self.bands]),
+            (278, long, [self.rows]),
+            (279, long, self.byte_counts),
+            (284, short, [1]),
+            (317, short, self.codec_tags[317])
+        ]
+        if self.mode in ('LA', 'RGBA'):
+            tags.append((338, short, [2]))  # 非预乘透明通道
+        if self.icc_profile:
+            tags.append((34675, undefined, self.icc_profile))
+
+        # 超过 4 字节的值放在 IFD 之后，条目中记录其偏移
+        data_offset = ifd_offset + 2 + 12 * len(tags) + 4
+        entries = []
+        extra = b''
+        for tag, kind, values in tags:
+            if kind == undefined:
+                payload = bytes(values)
+            else:
+                payload = struct.pack('<%d%s' % (len(values), 'H' if kind == short else 'I'), *values)
+            if len(payload) <= 4:
+                field = payload.ljust(4, b'\x00')
+            else:
+                field = struct.pack('<I', data_offset + len(extra))
+                extra += payload + b'\x00' * (len(payload) % 2)
+            entries.append(struct.pack('<HHI', tag, kind, len(values)) + field)
+        file.write(struct.pack('<H', len(tags)) + b''.join(entries) + struct.pack('<I', 0) + extra)
+        file.seek(4)
+        file.write(struct.pack('<I', ifd_offset))
+
+
+def save_deskewed_strips(image, angle, size, bg_color, deskew_folder, filename,
+                         preset=DEFAULT_ENCODER_PRESET, resample="bicubic", memory_budget=STRIP_MEMORY_BUDGET):
+    """分条旋转并逐条写入 PNG / TIFF，返回保存的文件名；输出格式或图片模式不支持时返回 None
+
+    旋转结果不在内存中整幅生成，工作内存按 memory_budget 限制（不含已解码的原图）。
+    始终使用 OpenCV 旋转；TIFF 按预设的压缩方式写入（1 位图片使用 tiff_bilevel_compression），
+    Deflate 的压缩级别与预设的 PNG 压缩级别相同。
+    先写入临时文件，完成后再替换，失败时不留下不完整的文件。
+    """
+    saved_filename = deskewed_filename(filename)
+    file_ext = os.path.splitext(saved_filename)[1].lower()
+    if image.mode not in STRIP_MODES or file_ext not in STRIP_FORMATS:
+        return None
+
+    settings = ENCODER_PRESETS[preset]
+    rows = strip_rows(image, angle, size, memory_budget)
+    file_path = os.path.join(deskew_folder, saved_filename)
+    temp_path = file_path + ".part"
+    icc_profile = image.info.get('icc_profile')
+
+    with timed_stage("strips") as info:
+        try:
+            with open(temp_path, 'wb') as f:
+                if file_ext == '.png':
+                    writer = PngStripWriter(f, size, image.mode, settings['png_compress_level'], icc_profile)
+                else:
+                    compression = encoder_options(file_ext, image.mode, settings)['compression']
+                    writer = TiffStripWriter(f, size, image.mode, rows, compression,
+                                             settings['png_compress_level'], icc_profile)
+                for strip in rotated_strips(image, angle, size, bg_color, resample, rows):
+                    writer.write(strip)
+                writer.finish()
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        info['bytes'] = os.path.getsize(file_path)
+
+    if saved_filename != filename:
+        print(f"JPEG转换为PNG保存: {filename} -> {saved_filename}")
+    print(f"Saved to Deskew folder in {rows}-row strips: {filename}")
+    return saved_filename
+
+
+def resolve_image_file(image_folder, filename):
+    """图片当前内容所在的文件：Deskew文件夹中已有输出时为输出文件，否则直接读取原图（写时复制）
+    
+    返回 (路径, os.stat 结果)，每个候选只做一次 stat；加载和缩略图都通过它定位文件。
+    """
+    for path in (os.path.join(image_folder, DESKEW_FOLDER_NAME, filename), os.path.join(image_folder, filename)):
+        try:
+            return path, os.stat(path)
+        except FileNotFoundError:
+            continue
+    raise FileNotFoundError(f"No such picture: {os.path.join(image_folder, filename)}")
+
+
+def reflink_file(source_path, output_path):
+    """克隆文件（Linux FICLONE，Btrfs、XFS 等文件系统上共享数据块），不支持时抛出 OSError"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflink is not supported on this platform")
+    try:
+        with open(source_path, 'rb') as source, open(output_path, 'wb') as output:
+            fcntl.ioctl(output.fileno(), FICLONE, source.fileno())
+    except OSError:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    shutil.copystat(source_path, output_path)
+
+
+def write_unchanged_output(source_path, output_path, mode="copy"):
+    """把无需旋转的图片写入输出文件夹，返回实际使用的方式
+    
+    mode：copy 复制，hardlink 硬链接，reflink 克隆，none 不写入（返回 None）；
+    硬链接或克隆不可用（跨设备、文件系统不支持）时退回复制。
+    """
+    if mode == "none":
+        return None
+    if mode == "hardlink":
+        try:
+            os.link(source_path, output_path)
+            return "hardlink"
+        except OSError as e:
+            print(f"Hardlink unavailable, copying instead: {e}")
+    elif mode == "reflink":
+        try:
+            reflink_file(source_path, output_path)
+            return "reflink"
+        except OSError as e:
+            print(f"Reflink unavailable, copying instead: {e}")
+    shutil.copy2(source_path, output_path)
+    return "copy"
+
+
+def detach_output(file_path):
+    """输出文件是原图的硬链接时先删除，避免原地写入同时改动原图"""
+    try:
+        if os.stat(file_path).st_nlink > 1:
+            os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def deskewed_filename(filename):
+    """保存到Deskew文件夹后的文件名（JPEG转为PNG，其余不变）"""
+    if os.path.splitext(filename)[1].lower() in ['.jpg', '.jpeg']:
+        return os.path.splitext(filename)[0] + '.png'
+    return filename
+
+
+def encoder_options(file_ext, mode, settings):
+    """PIL 保存参数：按输出格式和编码预设选择压缩方式"""
+    if file_ext == '.png':
+        return {'optimize': settings['png_optimize'], 'compress_level': settings['png_compress_level']}
+    if file_ext == '.webp':
+        # 无损模式下 quality 表示压缩力度
+        return {'lossless': True, 'method': settings['webp_method'], 'quality': settings['webp_quality']}
+    if file_ext == '.gif':
+        return {'optimize': settings['gif_optimize']}
+    if file_ext in ['.tiff', '.tif']:
+        # 1 位图片使用 CCITT Group 4
+        if mode == '1':
+            return {'compression': settings['tiff_bilevel_compression']}
+        return {'compression': settings['tiff_compression']}
+    return {}
+
+
+def encode_with_opencv(save_image, file_path, file_ext, settings):
+    """用 OpenCV 编码保存，格式或图片模式不支持时返回 False（改用 PIL）
+    
+    带 ICC 色彩配置或透明色（tRNS）的图片也返回 False：OpenCV 不写入这些信息，PIL 会保留。
+    预设要求 PNG 优化（png_optimize）时同时用 PIL 优化编码，保存两者中较小的结果。
+    """
+    if (save_image.mode not in ('L', 'RGB', 'RGBA') or file_ext not in OPENCV_ENCODE_FORMATS
+            or save_image.info.get('icc_profile') or 'transparency' in save_image.info):
+        return False
+    params = [cv2.IMWRITE_PNG_COMPRESSION, settings['png_compress_level']]
+    
+    pixels = np.asarray(save_image)
+    if save_image.mode == 'RGB':
+        pixels = cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR)
+    elif save_image.mode == 'RGBA':
+        pixels = cv2.cvtColor(pixels, cv2.COLOR_RGBA2BGRA)
+    # imencode + tofile 支持非 ASCII 路径（cv2.imwrite 在 Windows 上不支持）
+    ok, buffer = cv2.imencode(file_ext, pixels, params)
+    if not ok:
+        return False
+    
+    if settings['png_optimize']:
+        optimized = io.BytesIO()
+        save_image.save(optimized, format="PNG", **encoder_options(file_ext, save_image.mode, settings))
+        if optimized.tell() < buffer.nbytes:
+            with open(file_path, 'wb') as f:
+                f.write(optimized.getbuffer())
+            return True
+    buffer.tofile(file_path)
+    return True
+
+
+def save_deskewed_image(save_image, deskew_folder, filename, preset=DEFAULT_ENCODER_PRESET):
+    """按原格式无损保存图片到Deskew文件夹，返回实际保存的文件名
+    
+    preset 为 ENCODER_PRESETS 中的编码预设（fast / balanced / smallest），决定压缩级别、
+    WebP 压缩力度、TIFF 压缩方式和各格式使用的编码器（PIL 或 OpenCV）。
+    """
+    settings = ENCODER_PRESETS[preset]
+    saved_filename = deskewed_filename(filename)
+    file_path = os.path.join(deskew_folder, saved_filename)
+    
+    # JPEG转为PNG避免质量损失，按保存后的扩展名选择编码方式
+    file_ext = os.path.splitext(saved_filename)[1].lower()
+    
+    with timed_stage("encode") as info:
+        detach_output(file_path)
+        if not (file_ext in settings['opencv_formats'] and
+                encode_with_opencv(save_image, file_path, file_ext, settings)):
+            save_image.save(file_path, **encoder_options(file_ext, save_image.mode, settings))
+        info['bytes'] = os.path.getsize(file_path)
+    
+    if saved_filename != filename:
+        print(f"JPEG转换为PNG保存: {filename} -> {saved_filename}")
+    print(f"Saved to Deskew folder: {filename}")
+    return saved_filename
+
+
+class BackgroundSaver:
+    """后台保存队列 - 单个写入线程按提交顺序执行保存任务，排队任务占用的内存有上限
+    
+    submit(key, nbytes, job)：job() 在写入线程中生成并保存图片，返回保存的文件名；
+    排队任务的 nbytes 之和超过 max_bytes 时 submit 阻塞，直到写入线程腾出空间。
+    回调在写入线程中调用，不得等待主线程（主线程可能正阻塞在 wait/submit 中），
+    界面应把结果放入队列由主线程轮询：on_saved(key, saved_filename), on_failed(key, error)
+    """
+    
+    def __init__(self, max_bytes=SAVE_QUEUE_MAX_BYTES, on_saved=None, on_failed=None):
+        self.max_bytes = max_bytes
+        self.on_saved = on_saved
+        self.on_failed = on_failed
+        self._condition = threading.Condition()
+        self._jobs = deque()  # (key, nbytes, job)
+        self._pending = {}  # key -> 尚未完成的任务数
+        self._queued_bytes = 0
+        self._thread = None
+    
+    def submit(self, key, nbytes, job):
+        """提交保存任务；队列已满时等待（至少允许一个任务排队，避免超大图片永远无法提交）"""
+        with self._condition:
+            while self._jobs and self._queued_bytes + nbytes > self.max_bytes:
+                self._condition.wait()
+            self._jobs.append((key, nbytes, job))
+            self._pending[key] = self._pending.get(key, 0) + 1
+            self._queued_bytes += nbytes
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+    
+    def is_pending(self, key):
+        """该文件是否还有未完成的保存"""
+        with self._condition:
+            return key in self._pending
+    
+    @property
+    def pending_count(self):
+        with self._condition:
+            return sum(self._pending.values())
+    
+    def wait(self, key=None):
+        """等待指定文件（key 为 None 时等待全部）的保存完成"""
+        with self._condition:
+            while (key in self._pending) if key is not None else self._pending:
+                self._condition.wait()
+    
+    def _run(self):
+        """写入线程：依次取出任务执行，完成后释放队列空间并唤醒等待者"""
+        while True:
+            with self._condition:
+                while not self._jobs:
+                    self._condition.wait()
+                key, nbytes, job = self._jobs[0]
+            
+            error = None
+            try:
+                saved_filename = job()
+            except Exception as e:
+                error = e
+                print(f"Save failed: {key}: {str(e)}")
+            
+            with self._condition:
+                # 任务完成后才出队，排队内存包含正在保存的图片
+                self._jobs.popleft()
+                self._queued_bytes -= nbytes
+                self._pending[key] -= 1
+                if not self._pending[key]:
+                    del self._pending[key]
+                self._condition.notify_all()
+            
+            # 回调出错不能让写入线程退出，否则后续保存全部丢失、wait 永远等待
+            try:
+                if error is not None:
+                    if self.on_failed:
+                        self.on_failed(key, error)
+                elif self.on_saved:
+                    self.on_saved(key, saved_filename)
+            except Exception as e:
+                print(f"Save callback failed: {key}: {str(e)}")
+
+
+class DecodedImage:
+    """解码缓存中的一张图片：解码后的原图和显示用的缩小代理图（没有时为 None）"""
+    
+    def __init__(self, path, image, proxy=None, proxy_factor=1):
+        self.path = path
+        self.image = image
+        self.proxy = proxy
+        self.proxy_factor = proxy_factor
+        self.nbytes = image_nbytes(image) + (image_nbytes(proxy) if proxy is not None else 0)
+
+
+class DecodedImageCache:
+    """已解码图片的 LRU 缓存，按像素数据量限制总内存
+    
+    键为 (路径, 修改时间, 文件大小)，文件被改写后旧条目不再命中。最近一次 get 的图片（当前页）
+    不会被淘汰；超过内存上限的单张图片不缓存。
+    """
+    
+    def __init__(self, max_bytes=DECODED_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # 键 -> DecodedImage，按最近使用排序
+        self._bytes = 0
+        self._current_key = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key_for(path, file_stat):
+        return (path, file_stat.st_mtime_ns, file_stat.st_size)
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._current_key = key
+            return entry
+    
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+    
+    def put(self, key, entry, current=False, keep=()):
+        """加入缓存；同一路径的旧版本一并移除，超出内存上限时从最久未用的开始淘汰
+        
+        keep 中的条目（同一批预解码中优先级更高的图片）不淘汰，腾不出空间时放弃缓存这张。
+        """
+        with self._lock:
+            if entry.nbytes > self.max_bytes:
+                return
+            stale = [old for old in self._entries if old[0] == key[0]]
+            for old in stale:
+                self._bytes -= self._entries.pop(old).nbytes
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            if current:
+                self._current_key = key
+            protected = {key, self._current_key, *keep}
+            for old in list(self._entries):
+                if self._bytes <= self.max_bytes:
+                    break
+                if old not in protected:
+                    self._bytes -= self._entries.pop(old).nbytes
+            if self._bytes > self.max_bytes and not current:
+                self._bytes -= self._entries.pop(key).nbytes
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._current_key = None
+    
+    @property
+    def nbytes(self):
+        with self._lock:
+            return self._bytes
+
+
+class ImagePrefetcher:
+    """后台预解码 - 单个线程按请求顺序解码图片放入 DecodedImageCache
+    
+    request 传入按优先级排列的 (文件夹, 文件名)，替换尚未开始的旧请求；load 同步取得一张图片，
+    已缓存时直接返回，正在预解码时等待其完成，否则在调用线程中解码。
+    prepare(image) 返回 (代理图, 缩小倍数)，在解码线程中生成显示用的代理图。
+    """
+    
+    def __init__(self, cache=None, prepare=None):
+        self.cache = cache if cache is not None else DecodedImageCache()
+        self.prepare = prepare
+        self._condition = threading.Condition()
+        self._requests = deque()
+        self._batch_keys = set()  # 本批请求中已缓存的图片，后面的图片不能挤掉它们
+        self._decoding = None  # 正在预解码的路径
+        self._thread = None
+    
+    def request(self, items):
+        """替换预解码队列（items 为 (文件夹, 文件名)，越靠前越先解码）"""
+        with self._condition:
+            self._requests = deque(items)
+            self._batch_keys = set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+    
+    def cancel(self):
+        """清空尚未开始的预解码请求"""
+        with self._condition:
+            self._requests.clear()
+    
+    def decode(self, path):
+        """解码一张图片（不查缓存）"""
+        with timed_stage("decode") as info:
+            image = Image.open(path)
+            image.load()
+            info['bytes'] = os.path.getsize(path)
+        proxy, factor = self.prepare(image) if self.prepare else (None, 1)
+        return DecodedImage(path, image, proxy, factor)
+    
+    def load(self, image_folder, filename):
+        """取得当前页的解码图片，返回 DecodedImage"""
+        path, file_stat = resolve_image_file(image_folder, filename)
+        key = DecodedImageCache.key_for(path, file_stat)
+        with self._condition:
+            while self._decoding == path:
+                self._condition.wait()
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = self.decode(path)
+            self.cache.put(key, entry, current=True)
+        return entry
+    
+    def _run(self):
+        """预解码线程：依次处理请求，已缓存的跳过"""
+        while True:
+            with self._condition:
+                while not self._requests:
+                    self._condition.wait()
+                image_folder, filename = self._requests.popleft()
+                try:
+                    path, file_stat = resolve_image_file(image_folder, filename)
+                except OSError:
+                    continue
+                key = DecodedImageCache.key_for(path, file_stat)
+                if key in self.cache:
+                    self._batch_keys.add(key)
+                    continue
+                self._decoding = path
+                keep = set(self._batch_keys)
+            
+            try:
+                with timing_image(filename):
+                    self.cache.put(key, self.decode(path), keep=keep)
+                with self._condition:
+                    self._batch_keys.add(key)
+            except Exception as e:
+                print(f"Prefetch failed: {filename}: {str(e)}")
+            finally:
+                with self._condition:
+                    self._decoding = None
+                    self._condition.notify_all()
+
+
+def natural_sort(files):
+    """自然排序算法"""
+    def natural_sort_key(filename):
+        parts = re.split(r'(\d+)', filename)
+        return [int(part) if part.isdigit() else part.lower() for part in parts]
+    
+    return sorted(files, key=natural_sort_key)
+
+
+def deskew_file(task):
+    """批量纠偏工作函数（在子进程中运行）：解码 → 检测 → 旋转 → 编码
+    
+    task 字段：index, filename, source_path, output_folder, hough_method,
+    bg_color, lock_size, use_existing_copy（输出目录中已有副本时以副本为准）,
+    use_pyramid（可选，默认启用多分辨率检测）, angle_cache（可选，角度缓存数据库路径）,
+    collect_timings（可选，在结果的 timings 中返回阶段计时记录）,
+    rotation_backend / resample（可选，旋转引擎和插值方式，默认 OpenCV 双三次）,
+    encoder_preset（可选，输出编码预设，默认 DEFAULT_ENCODER_PRESET）,
+    memory_budget（可选，超过该工作内存的图片分条处理，默认 STRIP_MEMORY_BUDGET，0 为不分条）
+    unchanged_output（可选，无需旋转的图片写入输出目录的方式，见 UNCHANGED_OUTPUT_MODES，默认 copy）
+    """
+    result = {
+        'index': task['index'],
+        'filename': task['filename'],
+        'saved_filename': task['filename'],
+        'angle': 0.0,
+        'confidence': 0.0,
+        'detection_method': None,
+        'error': None
+    }
+    
+    # 收集阶段计时时，工作进程内的记录随结果返回
+    timings = enable_stage_timings() if task.get('collect_timings') else None
+    with timing_image(task['filename']):
+        try:
+            output_folder = task['output_folder']
+            os.makedirs(output_folder, exist_ok=True)
+            output_path = os.path.join(output_folder, task['filename'])
+            
+            # 1. 解码：界面批量纠偏与加载逻辑一致，优先处理Deskew文件夹中的副本
+            source_path = task['source_path']
+            if task.get('use_existing_copy') and os.path.exists(output_path):
+                source_path = output_path
+            detector = DeskewDetector(task['hough_method'], task.get('use_pyramid', True))
+            image = Image.open(source_path)
+            if image.format == 'JPEG' and detector.reduces_input:
+                # JPEG 只解码检测所需的缩小灰度图，需要旋转时再完整解码
+                image.close()
+                image = None
+                detection_input = open_detection_image(source_path)
+            else:
+                with timed_stage("decode") as info:
+                    image.load()
+                    info['bytes'] = os.path.getsize(source_path)
+                detection_input = (image,)
+            
+            # 2. 检测（命中缓存时跳过）
+            if task.get('angle_cache'):
+                try:
+                    detector.angle_cache = AngleCache(task['angle_cache'])
+                except sqlite3.Error as e:
+                    print(f"Angle cache unavailable: {e}")
+            try:
+                detection = detector.analyze_image(*detection_input)
+            finally:
+                if detector.angle_cache is not None:
+                    detector.angle_cache.close()
+            detection_input = None
+            
+            rotation_angle = detection.rotation_angle
+            result['confidence'] = detection.confidence
+            result['detection_method'] = detection.method
+            
+            # 3. 旋转（只有角度大于阈值时才旋转）
+            if abs(rotation_angle) > MIN_ROTATION_ANGLE:
+                if image is None:
+                    with timed_stage("decode") as info:
+                        image = Image.open(source_path)
+                        image.load()
+                        info['bytes'] = os.path.getsize(source_path)
+                backend = task.get('rotation_backend', DEFAULT_ROTATION_BACKEND)
+                resample = task.get('resample', "bicubic")
+                encoder_preset = task.get('encoder_preset', DEFAULT_ENCODER_PRESET)
+                memory_budget = task.get('memory_budget', STRIP_MEMORY_BUDGET)
+                
+                saved_filename = None
+                if needs_strip_processing(image, memory_budget):
+                    # 超大图片：分条旋转并逐条写入，不生成整幅旋转结果
+                    size = image.size if task['lock_size'] else expanded_size(image.size, rotation_angle)
+                    saved_filename = save_deskewed_strips(
+                        image, rotation_angle, size, task['bg_color'], output_folder, task['filename'],
+                        encoder_preset, resample, memory_budget
+                    )
+                if saved_filename is None:
+                    if task['lock_size']:
+                        save_image = rotate_to_size(image, rotation_angle, image.size, task['bg_color'],
+                                                    backend, resample)
+                    else:
+                        save_image = rotate_image(image, rotation_angle, task['bg_color'], backend, resample)
+                    
+                    # 4. 编码
+                    saved_filename = save_deskewed_image(save_image, output_folder, task['filename'], encoder_preset)
+                result['saved_filename'] = saved_filename
+                result['angle'] = rotation_angle
+            elif task.get('unchanged_output', "copy") != "none" and not os.path.exists(output_path):
+                # 无需旋转的图片原样写入（复制、硬链接或克隆），保证输出目录完整
+                with timed_stage("copy") as info:
+                    write_unchanged_output(source_path, output_path, task.get('unchanged_output', "copy"))
+                    info['bytes'] = os.path.getsize(output_path)
+        
+        except Exception as e:
+            print(f"Batch deskew failed for {task['filename']}: {e}")
+            result['error'] = str(e)
+    
+    if timings is not None:
+        result['timings'] = disable_stage_timings().records
+    return result
+
+
+def _init_worker(quiet, opencv_threads):
+    """工作进程初始化：按进程数分配 OpenCV 线程，避免多进程 × 多线程争用 CPU；可选屏蔽调试输出"""
+    cv2.setNumThreads(opencv_threads)
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+
+
+class BatchDeskewPipeline:
+    """批量纠偏流水线 - 在进程池中并行处理图片，通过回调报告进度"""
+    
+    def __init__(self, tasks, max_workers=None, on_progress=None, on_finished=None, quiet=False):
+        self.tasks = list(tasks)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.quiet = quiet  # 屏蔽工作进程的调试输出
+        self.on_progress = on_progress  # on_progress(result, processed, total)
+        self.on_finished = on_finished  # on_finished(processed, total)
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """在后台线程中启动流水线"""
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """请求停止：不再派发新任务，正在处理的图片完成后即结束"""
+        self._stop_event.set()
+    
+    @property
+    def is_stopped(self):
+        return self._stop_event.is_set()
+    
+    def run(self):
+        """执行流水线（阻塞），返回已处理的图片数量"""
+        total = len(self.tasks)
+        processed = 0
+        futures = {}  # future -> task
+        next_task = 0
+        # 在途任务数不超过工作进程数，保证停止请求能在一张图片内生效
+        max_in_flight = self.max_workers
+        
+        # 启用了阶段计时时，合并各工作进程返回的记录
+        stage_timings = current_stage_timings()
+        collect_timings = stage_timings is not None
+        opencv_threads = max(1, (os.cpu_count() or 1) // self.max_workers)
+        # 工作进程用 spawn 启动：界面在后台线程中启动进程池，此时 fork 会复制 Tk 和其他线程持有的锁
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(self.quiet, opencv_threads)) as executor:
+            while next_task < total or futures:
+                # 派发新任务
+                while (not self._stop_event.is_set() and next_task < total and 
+                       len(futures) < max_in_flight):
+                    task = self.tasks[next_task]
+                    if collect_timings:
+                        task = dict(task, collect_timings=True)
+                    futures[executor.submit(deskew_file, task)] = task
+                    next_task += 1
+                
+                # 停止时取消尚未开始的任务
+                if self._stop_event.is_set():
+                    for future in list(futures):
+                        if future.cancel():
+                            del futures[future]
+                
+                if not futures:
+                    break
+                
+                done, _ = wait(futures, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # 子进程异常退出等情况
+                        result = {
+                            'index': task['index'],
+                            'filename': task['filename'],
+                            'saved_filename': task['filename'],
+                            'angle': 0.0,
+                            'confidence': 0.0,
+                            'detection_method': None,
+                            'error': str(e)
+                        }
+                    if collect_timings:
+                        stage_timings.extend(result.pop('timings', []))
+                    processed += 1
+                    if self.on_progress:
+                        self.on_progress(result, processed, total)
+        
+        if self.on_finished:
+            self.on_finished(processed, total)
+        return processed